@@ -1,11 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from fastapi.routing import APIRoute
 
+from app.api.dependencies import get_unit_of_work
 from app.api.routes.admin import router as admin_router
 from app.api.routes.location import router as location_router
 from app.api.routes.user import router as user_router
 
-router = APIRouter(prefix="/api")
+# One session per request, shared by every repository and committed once.
+router = APIRouter(prefix="/api", dependencies=[Depends(get_unit_of_work)])
 
 
 @router.get("/ping", status_code=200, summary="Пинг", tags=["Пинг"])
@@ -1,11 +1,21 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, NamedTuple, Optional
 
 from app.config import TEST_MODE
 from app.infra.database.models import *
+from app.infra.database.session import unit_of_work
+from app.infra.repository.profiles import (
+    BOOKING_WITH_LOCATION,
+    LOCATION_SUMMARY,
+    TABLE_WITH_LOCATION,
+)
 from app.services import AdminService, BookingService, UserService
 from app.services.location import LocationService
+from app.services.principals import principal_cache
+from app.utils.pagination import Cursor, decode_cursor
 from app.utils.security import verify_jwt_token
 from fastapi import Depends, HTTPException, Query, WebSocketException
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 auth_scheme = HTTPBearer()
@@ -15,6 +25,12 @@ async def get_current_user(
     token: HTTPAuthorizationCredentials = Depends(auth_scheme),
     service: UserService = Depends(UserService),
 ):
+    # Test tokens are bare user ids, they must not pass for a verified JWT.
+    key = ("test-user" if TEST_MODE else "user", token.credentials)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal.row
+
     if TEST_MODE:
         decoded_data = {"user_id": token.credentials}
     else:
@@ -30,6 +46,7 @@ async def get_current_user(
     except:
         raise HTTPException(
             status_code=401, detail="Пользователь не авторизован.")
+    principal_cache.put(key, user, decoded_data)
     return user
 
 
@@ -40,6 +57,10 @@ async def get_current_ws_user(
     if not token:
         raise WebSocketException(code=1008)
 
+    principal = principal_cache.get(("user", token))
+    if principal is not None:
+        return principal.row
+
     decoded_data = verify_jwt_token(token)
     if not decoded_data:
         raise WebSocketException(code=1008)
@@ -50,6 +71,7 @@ async def get_current_ws_user(
             raise ValueError
     except:
         raise WebSocketException(code=1008)
+    principal_cache.put(("user", token), user, decoded_data)
     return user
 
 
@@ -57,6 +79,10 @@ async def get_current_admin(
     token: HTTPAuthorizationCredentials = Depends(auth_scheme),
     service: AdminService = Depends(AdminService),
 ):
+    principal = principal_cache.get(("admin", token.credentials))
+    if principal is not None:
+        return principal.row
+
     decoded_data = verify_jwt_token(token.credentials)
     if not decoded_data:
         raise HTTPException(status_code=401, detail="Админ не авторизован.")
@@ -67,6 +93,7 @@ async def get_current_admin(
             raise ValueError
     except:
         raise HTTPException(status_code=401, detail="Админ не авторизован.")
+    principal_cache.put(("admin", token.credentials), admin, decoded_data)
     return admin
 
 
@@ -89,7 +116,7 @@ CurrentWsUser = Annotated[User, Depends(get_current_ws_user)]
 async def get_exist_location(
     location_id: str, service: LocationService = Depends(LocationService)
 ):
-    location = await service.repo.get(location_id)
+    location = await service.repo.get(location_id, options=LOCATION_SUMMARY)
 
     if not location:
         raise HTTPException(status_code=404, detail="Локация не найдена")
@@ -111,7 +138,9 @@ async def get_admin_location_table(
     location: Location = Depends(get_admin_location),
     service: LocationService = Depends(LocationService),
 ):
-    table = await service.tables.find_one(id=table_id, location_id=location.id)
+    table = await service.tables.find_one(
+        id=table_id, location_id=location.id, options=TABLE_WITH_LOCATION
+    )
 
     if not table:
         raise HTTPException(status_code=404, detail="Место не найдено")
@@ -131,10 +160,37 @@ async def get_admin_location_table_name(
     return table
 
 
+class BookingFilter(NamedTuple):
+    time_from: Optional[datetime]
+    time_to: Optional[datetime]
+    after: Optional[Cursor]
+
+
+async def get_booking_filter(
+    time_from: Optional[datetime] = Query(
+        None, description="Только брони, которые заканчиваются позже"
+    ),
+    time_to: Optional[datetime] = Query(
+        None, description="Только брони, которые начинаются раньше"
+    ),
+    after: Optional[str] = Query(
+        None, description="Курсор из заголовка X-Next-Cursor: брони после него"
+    ),
+):
+    try:
+        cursor = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор страницы.")
+    return BookingFilter(time_from, time_to, cursor)
+
+
+AdminBookingFilter = Annotated[BookingFilter, Depends(get_booking_filter)]
+
+
 async def get_exist_booking(
     booking_id: str, service: BookingService = Depends(BookingService)
 ):
-    booking = await service.repo.get(booking_id)
+    booking = await service.repo.get(booking_id, options=BOOKING_WITH_LOCATION)
     if not booking:
         raise HTTPException(status_code=404, detail="Бронирование не найдено.")
     return booking
@@ -152,4 +208,14 @@ async def get_user_booking(
         raise HTTPException(
             status_code=403, detail="Вы не имеете доступ к редактированию бронирования."
         )
-    return book_member.booking
+    return booking
+
+
+async def get_unit_of_work(connection: HTTPConnection):
+    # A WebSocket lives for hours, it must not hold a session all along.
+    if connection.scope["type"] != "http":
+        yield
+        return
+
+    async with unit_of_work():
+        yield
@@ -0,0 +1,62 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.infra.database.session import engine
+
+
+class StatementCounter:
+    __slots__ = ("task", "count")
+
+    def __init__(self):
+        self.task = asyncio.current_task()
+        self.count = 0
+
+
+current_counter: ContextVar[Optional[StatementCounter]] = ContextVar(
+    "current_counter", default=None
+)
+
+
+def count_statement(*_):
+    counter = current_counter.get()
+    # Tasks spawned by a request inherit its counter, but what they run is
+    # not part of the response.
+    if counter is not None and counter.task is asyncio.current_task():
+        counter.count += 1
+
+
+event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+
+
+class StatementCountMiddleware:
+    """Reports the SQL statements a request ran in `X-Statement-Count`.
+
+    Enabled in TEST_MODE, the e2e tests hold the hot endpoints to a fixed
+    number of statements with it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        counter = StatementCounter()
+        token = current_counter.set(counter)
+
+        async def send_with_count(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Statement-Count", str(counter.count))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            current_counter.reset(token)
@@ -2,9 +2,16 @@ from fastapi import APIRouter, Depends, HTTPException
 
 from app.api.dependencies import CurrentAdmin
 from app.infra.database.models import Admin
-from app.schemas.admin import AdminMe, AdminSignIn, AdminSignInResponse, AdminSignUp
+from app.schemas.admin import (
+    AdminMe,
+    AdminSignIn,
+    AdminSignInResponse,
+    AdminSignUp,
+    PasswordHashingStats,
+)
 from app.services import AdminService
-from app.utils.security import create_jwt_token, verify_password
+from app.services.passwords import password_hasher
+from app.utils.security import create_jwt_token
 
 router = APIRouter(tags=["Аутентификация"])
 
@@ -39,8 +46,8 @@ async def admin_sign_up(
 async def admin_sign_in(
     data: AdminSignIn, service: AdminService = Depends(AdminService)
 ):
-    admin = await service.repo.find_one(login=data.login)
-    if admin is None or not verify_password(data.password, admin.password):
+    admin = await service.authenticate(data.login, data.password)
+    if admin is None:
         raise HTTPException(status_code=401, detail="Неверный логин или пароль.")
 
     auth_token = create_jwt_token(data={"admin_id": admin.id})
@@ -55,3 +62,14 @@ async def admin_sign_in(
 )
 async def admin_me(admin: CurrentAdmin):
     return admin.to_dict()
+
+
+@router.get(
+    "/auth/stats",
+    summary="Состояние хеширования паролей",
+    description="Число потоков хеширования, ожидающие задачи, счётчики и время ожидания в очереди в секундах.",
+    response_model=PasswordHashingStats,
+    status_code=200
+)
+async def password_hashing_stats(admin: CurrentAdmin):
+    return password_hasher.stats()
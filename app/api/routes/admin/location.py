@@ -1,13 +1,22 @@
+from datetime import timedelta
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 
-from app.api.dependencies import CurrentAdmin, get_admin_location
+from app.api.dependencies import AdminBookingFilter, CurrentAdmin, get_admin_location
+from app.config import SVG_MAX_BYTES
 from app.infra.database.models import Location
-from app.schemas.booking import BookingAdminResponse, UserBookingForAdmin
+from app.infra.database.session import after_commit
+from app.schemas.booking import (
+    BookingAdminResponse,
+    BulkBookingResult,
+    CreateBookingsBulk,
+)
 from app.schemas.location import *
 from app.services.booking import BookingService
 from app.services.location import LocationService
+from app.utils.websockets import notify_users
 
 router = APIRouter(prefix="/location")
 
@@ -93,47 +102,109 @@ async def put_svg(
 ):
     if not "svg" in file.content_type:
         raise HTTPException(status_code=400, detail="Передан недопустимый формат файла")
-    r = await service.set_svg(location_id=location.id, svg=await file.read())
+    # One byte over the cap is enough for the parser to refuse the file.
+    svg = await file.read(SVG_MAX_BYTES + 1)
+    r = await service.set_svg(location_id=location.id, svg=svg)
 
     return LocationResponse(**r.to_dict(), svg=r.svg)
 
 
 @router.get(
     "/{location_id}/bookings",
-    summary="Получить все брони в локации",
+    summary="Получить брони в локации",
+    description=(
+        "Брони по возрастанию времени начала, не больше `limit`. "
+        "Если есть следующая страница, её курсор приходит в заголовке X-Next-Cursor."
+    ),
     response_model=List[BookingAdminResponse],
     tags=["Admin Location"],
 )
 async def bookings_location_admin(
     admin: CurrentAdmin,
+    filters: AdminBookingFilter,
+    limit: int = Query(100, ge=1, le=1000),
     location: Location = Depends(get_admin_location),
     booking_service: BookingService = Depends(BookingService),
 ):
-    return [
-        BookingAdminResponse(
-            id=entry.id,
-            location_id=entry.table.location.id,
-            code=entry.code,
-            table_id=entry.table.id,
-            table_name=entry.table.table_name,
-            time_start=entry.time_start,
-            time_end=entry.time_end,
-            comment=entry.comment,
-            features=entry.features,
-            people_amount=entry.people_amount,
-            users=[
-                UserBookingForAdmin(
-                    id=bookuser.id,
-                    first_name=bookuser.user.first_name,
-                    username=bookuser.user.username,
-                    user_id=bookuser.user.id,
-                    status=bookuser.status,
-                )
-                for bookuser in entry.users
-            ],
+    content, cursor = await booking_service.get_admin_bookings(
+        location.id, admin.id, limit=limit, **filters._asdict()
+    )
+    # Already serialized, `response_model` only documents the shape.
+    return Response(
+        content,
+        media_type="application/json",
+        headers={"X-Next-Cursor": cursor} if cursor else None,
+    )
+
+
+@router.get(
+    "/{location_id}/bookings/stream",
+    summary="Выгрузить все брони в локации построчно",
+    description="NDJSON: одна бронь в строке, в том же порядке и с теми же фильтрами.",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+    tags=["Admin Location"],
+)
+async def stream_bookings_location_admin(
+    admin: CurrentAdmin,
+    filters: AdminBookingFilter,
+    location: Location = Depends(get_admin_location),
+    booking_service: BookingService = Depends(BookingService),
+):
+    return StreamingResponse(
+        booking_service.stream_admin_bookings(location.id, admin.id, **filters._asdict()),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post(
+    "/{location_id}/bookings",
+    summary="Создать много броней одним запросом",
+    description="Брони создаются в одной транзакции, результат по каждой — в том же порядке.",
+    response_model=List[BulkBookingResult],
+    tags=["Admin Location"],
+)
+async def create_bookings_admin(
+    data: CreateBookingsBulk,
+    location: Location = Depends(get_admin_location),
+    booking_service: BookingService = Depends(BookingService),
+):
+    results = await booking_service.create_bookings(
+        location,
+        [
+            dict(
+                table_id=item.table_id,
+                user_id=item.user_id,
+                time_start=item.time_start,
+                time_end=item.time_start + timedelta(hours=item.hours),
+                features=item.features,
+                comment=item.comment,
+                people_amount=item.people_amount,
+            )
+            for item in data.bookings
+        ],
+    )
+
+    created = [result for result in results if result["status"] == 201]
+    if created:
+        # One event for the whole batch instead of one per booking.
+        after_commit(
+            notify_users,
+            location.id,
+            {
+                "event": "bookings_created",
+                "bookings": [
+                    {
+                        "table_id": booking["table_name"],
+                        "time_start": str(booking["time_start"]),
+                        "time_end": str(booking["time_end"]),
+                    }
+                    for booking in created
+                ],
+            },
         )
-        for entry in await booking_service.get_location_bookings(location.id, admin.id)
-    ]
+
+    return [BulkBookingResult(**result) for result in results]
 
 
 @router.delete(
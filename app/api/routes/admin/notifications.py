@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from app.api.dependencies import CurrentAdmin
+from app.schemas.admin import NotificationStats
+from app.services.notification import notification_service
+
+router = APIRouter(prefix="/notifications", tags=["Уведомления"])
+
+
+@router.get(
+    "/stats",
+    summary="Состояние очереди уведомлений",
+    description="Длина очереди Telegram-уведомлений, счётчики доставки и задержка от постановки в очередь до отправки в секундах.",
+    response_model=NotificationStats,
+    status_code=200
+)
+async def notification_stats(admin: CurrentAdmin):
+    return notification_service.stats()
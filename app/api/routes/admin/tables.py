@@ -1,12 +1,24 @@
-import asyncio
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
-from app.api.dependencies import CurrentAdmin, get_admin_location_table_name, get_admin_location_table
+from app.api.dependencies import (
+    AdminBookingFilter,
+    CurrentAdmin,
+    get_admin_location_table,
+    get_admin_location_table_name,
+)
 from app.api.routes.user.book import validate_changed_time, validate_put_booking
 from app.config import TIMEZONE
 from app.infra.database.models import Table
+from app.infra.database.session import after_commit
+from app.infra.repository.profiles import (
+    BOOKING_FOR_ADMIN_LIST,
+    BOOKING_USER_WITH_USER,
+    BOOKING_WITH_LOCATION,
+    BOOKING_WITH_TABLE,
+)
 from app.schemas.booking import (
     BookingAdminResponse,
     CreateBookingAdmin,
@@ -14,6 +26,7 @@ from app.schemas.booking import (
     UserBookingForAdmin,
 )
 from app.schemas.tables import *
+from app.services.availability import availability_index
 from app.services.booking import BookingService
 from app.services.queue import QueueService
 from app.services.table import TableService
@@ -37,39 +50,49 @@ async def get_table(
 
 @router.get(
     "/{location_id}/{table_name}/bookings",
-    summary="Получить все брони у мест",
+    summary="Получить брони у места",
+    description=(
+        "Брони по возрастанию времени начала, не больше `limit`. "
+        "Если есть следующая страница, её курсор приходит в заголовке X-Next-Cursor."
+    ),
     response_model=List[BookingAdminResponse],
 )
 async def table_bookings_admin(
     admin: CurrentAdmin,
+    filters: AdminBookingFilter,
+    limit: int = Query(100, ge=1, le=1000),
     table: Table = Depends(get_admin_location_table_name),
-    service: TableService = Depends(TableService),
+    service: BookingService = Depends(BookingService),
 ):
-    return [
-        BookingAdminResponse(
-            id=entry.id,
-            location_id=entry.table.location.id,
-            code=entry.code,
-            table_id=entry.table.id,
-            table_name=entry.table.table_name,
-            time_start=entry.time_start,
-            time_end=entry.time_end,
-            comment=entry.comment,
-            features=entry.features,
-            people_amount=entry.people_amount,
-            users=[
-                UserBookingForAdmin(
-                    id=bookuser.id,
-                    first_name=bookuser.user.first_name,
-                    username=bookuser.user.username,
-                    user_id=bookuser.user.id,
-                    status=bookuser.status,
-                )
-                for bookuser in entry.users
-            ],
-        )
-        for entry in await service.repo.get_table_bookings(table.id, admin.id)
-    ]
+    content, cursor = await service.get_admin_bookings(
+        table.location_id, admin.id, table_id=table.id, limit=limit, **filters._asdict()
+    )
+    return Response(
+        content,
+        media_type="application/json",
+        headers={"X-Next-Cursor": cursor} if cursor else None,
+    )
+
+
+@router.get(
+    "/{location_id}/{table_name}/bookings/stream",
+    summary="Выгрузить все брони у места построчно",
+    description="NDJSON: одна бронь в строке, в том же порядке и с теми же фильтрами.",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def stream_table_bookings_admin(
+    admin: CurrentAdmin,
+    filters: AdminBookingFilter,
+    table: Table = Depends(get_admin_location_table_name),
+    service: BookingService = Depends(BookingService),
+):
+    return StreamingResponse(
+        service.stream_admin_bookings(
+            table.location_id, admin.id, table_id=table.id, **filters._asdict()
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.patch(
@@ -83,11 +106,10 @@ async def update_booking_admin(
     booking_id: str,
     table: Table = Depends(get_admin_location_table),
     booking_service: BookingService = Depends(BookingService),
-    table_service: TableService = Depends(TableService),
     queue_service: QueueService = Depends(QueueService),
     tables_service: TableService = Depends(TableService),
 ):
-    booking = await booking_service.repo.get(booking_id)
+    booking = await booking_service.repo.get(booking_id, options=BOOKING_WITH_LOCATION)
     if booking.table_id != table.id:
         raise HTTPException(status_code=404, detail="Бронь не найдена")
 
@@ -95,38 +117,37 @@ async def update_booking_admin(
     await validate_changed_time(
         data=update_data,
         booking=booking,
-        table_service=table_service,
         booking_service=booking_service,
     )
 
     response = await booking_service.repo.update(
         booking.id,
+        options=BOOKING_FOR_ADMIN_LIST,
         features=update_data.features,
         comment=update_data.comment,
         time_start=update_data.time_start,
         time_end=time_end,
     )
-    asyncio.create_task(
-        notify_users(
-            booking.table.location_id,
-            {
-                "event": "booking_updated",
-                "table_id": booking.table.table_name,
-                "time_start": str(update_data.time_start),
-                "time_end": str(time_end),
-            },
-        )
+    after_commit(availability_index.update, response)
+    after_commit(
+        notify_users,
+        booking.table.location_id,
+        {
+            "event": "booking_updated",
+            "table_id": booking.table.table_name,
+            "time_start": str(update_data.time_start),
+            "time_end": str(time_end),
+        },
     )
     if booking.table.max_people_amount == 1:
         now = datetime.now(TIMEZONE).replace(minute=0, second=0, microsecond=0)
-        asyncio.create_task(
-            handle_additional_operations(
-                booking, queue_service, tables_service, booking_service, now, 1
-            )
+        after_commit(
+            handle_additional_operations,
+            booking, queue_service, tables_service, booking_service, now, 1,
         )
     return BookingAdminResponse(
         id=response.id,
-        location_id=response.table.location.id,
+        location_id=response.table.location_id,
         code=response.code,
         table_id=response.table.id,
         table_name=response.table.table_name,
@@ -161,26 +182,25 @@ async def delete_booking_admin(
     queue_service: QueueService = Depends(QueueService),
     tables_service: TableService = Depends(TableService),
 ):
-    booking = await booking_service.repo.get(booking_id)
+    booking = await booking_service.repo.get(booking_id, options=BOOKING_WITH_TABLE)
     if booking.table_id != table.id:
         raise HTTPException(status_code=404, detail="Бронь не найдена")
 
     await booking_service.repo.delete(booking.id)
-    asyncio.create_task(
-        notify_users(
-            booking.table.location_id,
-            {
-                "event": "booking_canceled",
-                "table_id": booking.table.table_name,
-            },
-        )
+    after_commit(availability_index.remove, booking.id)
+    after_commit(
+        notify_users,
+        booking.table.location_id,
+        {
+            "event": "booking_canceled",
+            "table_id": booking.table.table_name,
+        },
     )
     if booking.table.max_people_amount == 1:
         now = datetime.now(TIMEZONE).replace(minute=0, second=0, microsecond=0)
-        asyncio.create_task(
-            handle_additional_operations(
-                booking, queue_service, tables_service, booking_service, now, 1
-            )
+        after_commit(
+            handle_additional_operations,
+            booking, queue_service, tables_service, booking_service, now, 1,
         )
     return Response(status_code=204)
 
@@ -234,24 +254,23 @@ async def create_booking(
     )
 
     user_booking = await booking_service.booking_users.find_one(
-        status="creator", booking_id=booking.id
+        status="creator", booking_id=booking.id, options=BOOKING_USER_WITH_USER
     )
 
-    asyncio.create_task(
-        notify_users(
-            table.location_id,
-            {
-                "event": "booking_created",
-                "table_id": booking.table.table_name,
-                "time_start": str(create_data.time_start),
-                "time_end": str(time_end),
-            },
-        )
+    after_commit(
+        notify_users,
+        table.location_id,
+        {
+            "event": "booking_created",
+            "table_id": booking.table.table_name,
+            "time_start": str(create_data.time_start),
+            "time_end": str(time_end),
+        },
     )
 
     return BookingAdminResponse(
         id=booking.id,
-        location_id=booking.table.location.id,
+        location_id=booking.table.location_id,
         code=booking.code,
         table_id=booking.table.id,
         table_name=booking.table.table_name,
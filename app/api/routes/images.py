@@ -0,0 +1,113 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app.infra.repository.profiles import LOCATION_SUMMARY
+from app.services.floor_plans import floor_plans
+from app.services.location import LocationService
+
+router = APIRouter(prefix="/images", tags=["Схемы залов"])
+
+# A hashed URL always has the same content.
+IMMUTABLE = "public, max-age=31536000, immutable"
+SVG = "image/svg+xml"
+# Plans are uploaded by admins and served from the API origin, the same as
+# the admin panel's cookies: scripts in them must never run.
+SANDBOX = {
+    "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    "X-Content-Type-Options": "nosniff",
+}
+
+
+class SendfileResponse(FileResponse):
+    """Hands the file to the server when it offers the ASGI zero-copy
+    extension, so the kernel sends it with sendfile. Servers without it,
+    uvicorn among them, get the usual chunked FileResponse."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            "http.response.zerocopy" not in scope.get("extensions", {})
+            or scope["method"] == "HEAD"
+            or "range" in Headers(scope=scope)
+        ):
+            return await super().__call__(scope, receive, send)
+
+        with open(self.path, "rb") as file:
+            self.set_stat_headers(os.fstat(file.fileno()))
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            await send({"type": "http.response.zerocopy", "file": file, "more_body": False})
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def floor_plan_response(request: Request, path, cache_control: str) -> Response:
+    headers = {"ETag": f'"{path.stem}"', "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return SendfileResponse(path, media_type=SVG, headers={**headers, **SANDBOX})
+
+
+@router.get(
+    "/{location_id}/{digest}.svg",
+    summary="Схема зала по хешу содержимого",
+    response_class=Response,
+    responses={200: {"content": {SVG: {}}}, 304: {}},
+)
+async def get_floor_plan(
+    request: Request,
+    location_id: str,
+    digest: str = Path(pattern="^[0-9a-f]{64}$"),
+):
+    etag = f'"{digest}"'
+    # Answered before the cache is even looked at.
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=304, headers={"ETag": etag, "Cache-Control": IMMUTABLE}
+        )
+
+    path = await floor_plans.get(location_id, digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Схема зала не найдена")
+
+    return floor_plan_response(request, path, IMMUTABLE)
+
+
+@router.get(
+    "/{location_id}.svg",
+    summary="Текущая схема зала",
+    response_class=Response,
+    responses={200: {"content": {SVG: {}}}, 304: {}},
+)
+async def get_current_floor_plan(
+    request: Request,
+    location_id: str,
+    service: LocationService = Depends(LocationService),
+):
+    location = await service.repo.get(location_id, options=LOCATION_SUMMARY)
+    if not location:
+        raise HTTPException(status_code=404, detail="Локация не найдена")
+
+    path = await floor_plans.get(location.id, location.svg_hash)
+    if path is None and location.svg_hash:
+        # The plan was replaced behind this hash, take the one in S3.
+        path = await floor_plans.get(location.id, None)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Схема зала не найдена")
+
+    return floor_plan_response(request, path, "no-cache")
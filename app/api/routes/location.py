@@ -1,10 +1,17 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.api.dependencies import get_exist_location
 from app.infra.database.models import Location
-from app.schemas import GetBusyTables, LocationInfo, LocationResponse, TableResponse
+from app.schemas import (
+    BusyMatrixResponse,
+    GetBusyMatrix,
+    GetBusyTables,
+    LocationInfo,
+    LocationResponse,
+    TableResponse,
+)
 from app.services import BookingService, LocationService
 
 router = APIRouter(prefix="/location", tags=["Локации"])
@@ -30,13 +37,27 @@ async def get_location(location: Location = Depends(get_exist_location)):
 @router.get(
     "/{location_id}/tables",
     summary="Получение мест локации",
+    description="С x_min, y_min, x_max, y_max только места, чья рамка на схеме пересекает эту область.",
     response_model=List[TableResponse],
 )
 async def get_location_tables(
     location: Location = Depends(get_exist_location),
     service: LocationService = Depends(LocationService),
+    x_min: Optional[float] = None,
+    y_min: Optional[float] = None,
+    x_max: Optional[float] = None,
+    y_max: Optional[float] = None,
 ):
-    tables = await service.get_location_tables(location_id=location.id)
+    area = (x_min, y_min, x_max, y_max)
+    if any(v is None for v in area):
+        if any(v is not None for v in area):
+            raise HTTPException(
+                status_code=400,
+                detail="Область задаётся четырьмя координатами: x_min, y_min, x_max, y_max.",
+            )
+        area = None
+
+    tables = await service.get_location_tables(location_id=location.id, area=area)
 
     return [
         TableResponse(
@@ -45,6 +66,10 @@ async def get_location_tables(
             location_id=table.location_id,
             features=table.features,
             max_people_amount=table.max_people_amount,
+            x=table.x,
+            y=table.y,
+            width=table.width,
+            height=table.height,
         )
         for table in tables
     ]
@@ -63,3 +88,18 @@ async def get_location_bookings(
     return await booking_service.get_busy_table_names(
         location_id=location.id, time_start=data.time_start, hours=data.hours
     )
+
+
+@router.post(
+    "/{location_id}/bookings/matrix",
+    summary="Получение занятости мест в нескольких промежутках времени",
+    response_model=BusyMatrixResponse,
+)
+async def get_location_bookings_matrix(
+    data: GetBusyMatrix,
+    location: Location = Depends(get_exist_location),
+    booking_service: BookingService = Depends(BookingService),
+):
+    return await booking_service.get_busy_matrix(
+        location_id=location.id, windows=data.windows
+    )
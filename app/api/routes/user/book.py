@@ -1,5 +1,5 @@
-import asyncio
 from datetime import datetime, timedelta
+from typing import Literal, Optional
 
 from fastapi import (
     APIRouter,
@@ -16,14 +16,17 @@ from app.api.dependencies import (
     get_exist_location,
     get_user_booking,
 )
-from app.config import TIMEZONE, active_connections
+from app.config import TIMEZONE
 from app.infra.database.models import Booking, BookingUserStatusEnum, Location, Table
+from app.infra.database.session import after_commit
+from app.infra.repository.profiles import BOOKING_WITH_TABLE, TABLE_WITH_LOCATION
 from app.schemas.booking import BookingResponse, CreateBooking, UpdateBooking
 from app.services import BookingService
+from app.services.availability import availability_index
 from app.services.queue import QueueService
 from app.services.table import TableService
 from app.utils.alg import handle_additional_operations
-from app.utils.websockets import notify_users
+from app.utils.websockets import notify_users, subscribe
 
 router = APIRouter(prefix="/booking", tags=["Пользовательское бронирование"])
 
@@ -34,7 +37,7 @@ async def get_exist_location_table(
     table_service: TableService = Depends(TableService),
 ):
     table = await table_service.repo.find_one(
-        table_name=table_name, location_id=location.id
+        table_name=table_name, location_id=location.id, options=TABLE_WITH_LOCATION
     )
 
     if not table:
@@ -68,7 +71,6 @@ async def validate_put_booking(data: CreateBooking, table: Table):
 async def validate_changed_time(
     data: CreateBooking,
     booking: Booking,
-    table_service: TableService,
     booking_service: BookingService,
 ):
     now = datetime.now(TIMEZONE)
@@ -90,8 +92,6 @@ async def validate_changed_time(
             status_code=409, detail="Начало брони должно быть меньше, чем её конец."
         )
 
-    table = await table_service.repo.get(booking.table_id)
-
     if (
         booking.table.location.open_hour != 0
         and booking.table.location.close_hour != 24
@@ -109,7 +109,7 @@ async def validate_changed_time(
             )
 
     if not await booking_service.is_booking_avalale(
-        table.table_name,
+        booking.table.table_name,
         booking.table.location_id,
         data.time_start,
         time_end,
@@ -146,16 +146,15 @@ async def create_booking(
         user_id=user.id,
     )
 
-    asyncio.create_task(
-        notify_users(
-            table.location_id,
-            {
-                "event": "booking_created",
-                "table_id": booking.table.table_name,
-                "time_start": str(create_data.time_start),
-                "time_end": str(time_end),
-            },
-        )
+    after_commit(
+        notify_users,
+        table.location_id,
+        {
+            "event": "booking_created",
+            "table_id": booking.table.table_name,
+            "time_start": str(create_data.time_start),
+            "time_end": str(time_end),
+        },
     )
 
     return BookingResponse(
@@ -188,25 +187,24 @@ async def cancel_booking(
         )
 
     await booking_service.repo.delete(booking.id)
+    after_commit(availability_index.remove, booking.id)
 
     now = datetime.now(TIMEZONE).replace(minute=0, second=0, microsecond=0)
-    asyncio.create_task(
-        notify_users(
-            booking.table.location_id,
-            {
-                "event": "booking_canceled",
-                "table_id": booking.table.table_name,
-                "time_start": str(booking.time_start),
-                "time_end": str(booking.time_end),
-            },
-        )
+    after_commit(
+        notify_users,
+        booking.table.location_id,
+        {
+            "event": "booking_canceled",
+            "table_id": booking.table.table_name,
+            "time_start": str(booking.time_start),
+            "time_end": str(booking.time_end),
+        },
     )
 
     if booking.table.max_people_amount == 1:
-        asyncio.create_task(
-            handle_additional_operations(
-                booking, queue_service, tables_service, booking_service, now, user.id
-            )
+        after_commit(
+            handle_additional_operations,
+            booking, queue_service, tables_service, booking_service, now, user.id,
         )
     return Response(status_code=204)
 
@@ -230,34 +228,33 @@ async def update_booking(
     await validate_changed_time(
         data=update_data,
         booking=booking,
-        table_service=tables,
         booking_service=booking_service,
     )
 
     response = await booking_service.repo.update(
         booking.id,
+        options=BOOKING_WITH_TABLE,
         features=update_data.features,
         comment=update_data.comment,
         time_start=update_data.time_start,
         time_end=time_end,
     )
-    asyncio.create_task(
-        notify_users(
-            booking.table.location_id,
-            {
-                "event": "booking_updated",
-                "table_id": booking.table.table_name,
-                "time_start": str(update_data.time_start),
-                "time_end": str(time_end),
-            },
-        )
+    after_commit(availability_index.update, response)
+    after_commit(
+        notify_users,
+        booking.table.location_id,
+        {
+            "event": "booking_updated",
+            "table_id": booking.table.table_name,
+            "time_start": str(update_data.time_start),
+            "time_end": str(time_end),
+        },
     )
     if booking.table.max_people_amount == 1:
         now = datetime.now(TIMEZONE).replace(minute=0, second=0, microsecond=0)
-        asyncio.create_task(
-            handle_additional_operations(
-                booking, queue_service, tables, booking_service, now, user.id
-            )
+        after_commit(
+            handle_additional_operations,
+            booking, queue_service, tables, booking_service, now, user.id,
         )
     return BookingResponse(
         **response.to_dict(),
@@ -271,14 +268,23 @@ async def websocket_endpoint(
     websocket: WebSocket,
     user: CurrentWsUser,
     location: Location = Depends(get_exist_location),
+    encoding: Literal["json", "msgpack"] = "json",
+    batch: bool = False,
+    last_seq: Optional[int] = None,
+    stream: Optional[str] = None,
 ):
     await websocket.accept()
-    if not active_connections.get(location.id):
-        active_connections[location.id] = {user.id: websocket}
-    else:
-        active_connections[location.id][user.id] = websocket
+    connection = await subscribe(
+        location.id, user.id, websocket, encoding, batch, last_seq, stream
+    )
+    # Liveness is checked by the server's protocol-level ping/pong; a dead
+    # peer or an eviction ends up as a disconnect message here.
     try:
-        while True:
-            await asyncio.sleep(1)
-    except WebSocketDisconnect:
-        del active_connections[location.id][user.id]
+        while connection.alive:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        connection.close(code=None)
@@ -1,4 +1,3 @@
-import asyncio
 from datetime import datetime, timedelta
 from typing import List
 
@@ -7,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Response
 from app.api.dependencies import CurrentUser, get_exist_location
 from app.config import TIMEZONE
 from app.infra.database.models import Location
+from app.infra.database.session import after_commit
 from app.schemas.queue import JoinQueue, QueueReponse
 from app.services.booking import BookingService
 from app.services.queue import QueueService
@@ -67,16 +67,15 @@ async def join_queue(
                 table_name=table[1],
                 user_id=user.id,
             )
-            asyncio.create_task(
-                notify_users(
-                    booking.table.location_id,
-                    {
-                        "event": "booking_created",
-                        "table_id": booking.table.table_name,
-                        "time_start": str(booking.time_start),
-                        "time_end": str(booking.time_end),
-                    },
-                )
+            after_commit(
+                notify_users,
+                booking.table.location_id,
+                {
+                    "event": "booking_created",
+                    "table_id": booking.table.table_name,
+                    "time_start": str(booking.time_start),
+                    "time_end": str(booking.time_end),
+                },
             )
             return Response(status_code=204)
 
@@ -10,6 +10,7 @@ from app.infra.database.models import Booking
 from app.infra.repository import UserRepository
 from app.infra.repository import AdminRepository
 from app.services import BookingService, QueueService, TableService
+from app.services.availability import availability_index
 from app.utils.alg import handle_additional_operations
 from app.utils.websockets import notify_users
 
@@ -28,13 +29,14 @@ async def clear(message: Message):
 
     location = await message.bot.location.repo.get_or_create(**LOCATION)
 
-    bookings: List[Booking] = await message.bot.booking.get_location_bookings(location_id=location.id, admin_id=ADMIN['id'])
+    bookings: List[Booking] = await message.bot.booking.get_location_bookings(location_id=location.id, admin_id=ADMIN['id'], limit=1)
 
     now = datetime.now(TIMEZONE).replace(minute=0, second=0, microsecond=0)
     
     booking = bookings[0]
     
     await message.bot.booking.repo.delete(booking.id)
+    availability_index.remove(booking.id)
     await asyncio.create_task(handle_additional_operations(booking, QueueService(), TableService(), BookingService(), now, 0))
 
     await message.answer(f'Бронь отменена {booking.id} {booking.table}')
@@ -58,21 +60,22 @@ async def book_all(message: Message):
     time_end = datetime(year=2025, month=3, day=day, hour=23,
                         minute=0, second=0, microsecond=0, tzinfo=None)
 
+    bookings = []
     for i in range(len(tables)):
         table = tables[i]
 
         user_data = dict(username=f"TestUser{i}", id=int(i), first_name=f"TestUser{i}")
         await UserRepository().get_or_create(**user_data)
 
-        await message.bot.booking.create_booking(
+        bookings.append(dict(
             table_id=table.id,
+            user_id=user_data['id'],
             time_start=time_start,
             time_end=time_end,
             features=[],
             comment='auto',
             people_amount=1,
-            location_id=location.id,
-            table_name=table.table_name,
-            user_id=user_data['id']
-        )
+        ))
+
+    await message.bot.booking.create_bookings(location=location, bookings=bookings)
     await message.answer('OK')
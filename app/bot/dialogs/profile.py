@@ -46,7 +46,7 @@ async def handle_contact(message: types.Message):
     service: UserService = UserService()
 
     try:
-        await service.repo.update(message.chat.id, phone=phone_number)
+        await service.update(message.chat.id, phone=phone_number)
         await message.answer(
             f"📞 Ваш номер телефона {phone_number} был успешно привязан!"
         )
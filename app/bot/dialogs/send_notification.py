@@ -3,11 +3,12 @@ from datetime import datetime, time, timedelta
 
 from aiogram import F, Router, types
 from aiogram.fsm.context import FSMContext
-from sqlalchemy.orm import selectinload
 
 from app.config import TIMEZONE
-from app.infra.database.models import Booking, BookingUserStatusEnum, Table
+from app.infra.database.models import Booking, BookingUserStatusEnum
 from app.infra.repository.booking import BookingRepository
+from app.infra.repository.profiles import BOOKING_WITH_LOCATION, BOOKING_WITH_TABLE
+from app.services.availability import availability_index
 from app.services.booking import BookingService
 from app.services.event_checker import BookingCallbackData
 from app.utils.websockets import notify_users
@@ -27,7 +28,7 @@ async def handle_booking_extension(
         # async with BookingRepository.session() as session:
         booking = await booking_service.repo.get(
             booking_id,
-            options=[selectinload(Booking.table).selectinload(Table.location)],
+            options=BOOKING_WITH_LOCATION,
         )
 
         if not booking:
@@ -71,10 +72,12 @@ async def handle_booking_extension(
                 show_alert=True,
             )
 
-        await booking_service.repo.update(
+        updated = await booking_service.repo.update(
             booking.id,
+            options=BOOKING_WITH_TABLE,
             time_end=new_end_time,
         )
+        availability_index.update(updated)
 
         # booking.time_end = new_end_time
         # await session.commit()
@@ -107,7 +110,7 @@ async def handle_booking_start_cancel(
         booking_id = callback_data.booking_id
 
         async with BookingRepository.session() as session:
-            booking = await session.get(Booking, booking_id)
+            booking = await session.get(Booking, booking_id, options=BOOKING_WITH_TABLE)
             if not booking:
                 return await callback.answer("⚠️ Бронь не найдена", show_alert=True)
 
@@ -131,6 +134,7 @@ async def handle_booking_start_cancel(
                 )
 
             await booking_service.repo.delete(booking.id)
+            availability_index.remove(booking.id)
 
             if booking.time_start < now:
                 asyncio.create_task(notify_users(
@@ -16,6 +16,7 @@ from aiogram_dialog.manager.manager import ManagerImpl
 from aiogram_dialog.manager.message_manager import MessageManager
 from app.exceptions import ServiceException
 from app.services import *
+from app.services.principals import principal_cache
 
 
 async def create_ref_link(payload):
@@ -104,11 +105,17 @@ class UserMiddleware(BaseMiddleware):
         message: Message,
         data: dict[str:Any],
     ) -> Any:
-        user = await message.bot.users.get_or_create(
-            message.from_user.id,
-            message.from_user.first_name,
-            message.from_user.username,
-        )
+        key = ("telegram", message.from_user.id)
+        principal = principal_cache.get(key)
+        if principal is not None:
+            user = principal.row
+        else:
+            user = await message.bot.users.get_or_create(
+                message.from_user.id,
+                message.from_user.first_name,
+                message.from_user.username,
+            )
+            principal_cache.put(key, user)
 
         data["user"] = user
 
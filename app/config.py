@@ -1,4 +1,5 @@
 from os import getenv
+from tempfile import gettempdir
 from pathlib import Path
 from typing import Dict
 
@@ -11,6 +12,9 @@ load_dotenv()
 BASE_DIR = Path(__file__).parent.resolve()
 
 ENGINE = getenv("ENGINE", "sqlite+aiosqlite:///./infra/database/database.db")
+# "postgres" shares WebSocket events between worker processes, "memory" keeps
+# them inside one process.
+EVENT_BUS = getenv("EVENT_BUS") or ("postgres" if "asyncpg" in ENGINE else "memory")
 
 TELEGRAM_BOT_TOKEN = getenv("TELEGRAM_BOT_TOKEN")
 HOST = getenv("HOST")
@@ -25,5 +29,30 @@ TIMEZONE = pytz.timezone(getenv("TIMEZONE", "Europe/Moscow"))
 MINIO_ROOT_USER = getenv("MINIO_ROOT_USER")
 MINIO_ROOT_PASSWORD = getenv("MINIO_ROOT_PASSWORD")
 MINIO_URL = getenv("MINIO_URL")
-
+# Keep-alive connections of the shared S3 client.
+S3_MAX_CONNECTIONS = int(getenv("S3_MAX_CONNECTIONS", 20))
+# Floor plan SVGs served by the backend, named by their SHA-256.
+SVG_CACHE_DIR = Path(getenv("SVG_CACHE_DIR") or Path(gettempdir(), "floor-plans"))
+# Past this size the oldest cached plans are removed.
+SVG_CACHE_MAX_BYTES = int(getenv("SVG_CACHE_MAX_BYTES", 256 * 2**20))
+# Uploaded floor plans are parsed in worker processes, within these caps.
+SVG_MAX_BYTES = int(getenv("SVG_MAX_BYTES", 20 * 2**20))
+SVG_MAX_ELEMENTS = int(getenv("SVG_MAX_ELEMENTS", 500_000))
+SVG_PARSE_WORKERS = int(getenv("SVG_PARSE_WORKERS", 2))
+
+# Protocol-level WebSocket heartbeats, in seconds: a peer that does not
+# answer a ping within the timeout is disconnected.
+WS_PING_INTERVAL = float(getenv("WS_PING_INTERVAL", 20))
+WS_PING_TIMEOUT = float(getenv("WS_PING_TIMEOUT", 20))
+
+# Authenticated users and admins kept in memory per process, by token or
+# Telegram id; the TTL (seconds) bounds how stale a cached profile can be.
+PRINCIPAL_CACHE_SIZE = int(getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(getenv("PRINCIPAL_CACHE_TTL", 300))
+
+# Threads hashing and verifying admin passwords, also the number of
+# hashes computed at once.
+PASSWORD_HASH_WORKERS = int(getenv("PASSWORD_HASH_WORKERS", 4))
+
+# location_id -> connections of that location in this process
 active_connections = {}
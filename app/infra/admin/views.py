@@ -1,32 +1,69 @@
 from app.infra.database.models import Booking, Location, Table, User, Admin, BookingUser
+from app.infra.repository.table import TableRepository
+from app.services.availability import availability_index
+from app.services.principals import principal_cache
 from sqladmin import ModelView
 
 
 class AdminView(ModelView): ...
 
 
-class AdminAdmin(AdminView, model=Admin):
+# Not an AdminView itself: the panel registers the direct subclasses of it.
+class PrincipalViewMixin:
+    """Drops cached logins of a user or admin edited in the panel."""
+
+    async def after_model_change(self, data, model, is_created, request):
+        principal_cache.invalidate(type(model), model.id)
+
+    async def after_model_delete(self, model, request):
+        principal_cache.invalidate(type(model), model.id)
+
+
+class AvailabilityViewMixin:
+    """Reloads the availability index of a location edited in the panel."""
+
+    async def invalidate_index(self, model):
+        availability_index.invalidate(model.location_id)
+
+    async def after_model_change(self, data, model, is_created, request):
+        await self.invalidate_index(model)
+
+    async def after_model_delete(self, model, request):
+        await self.invalidate_index(model)
+
+
+class AdminAdmin(PrincipalViewMixin, AdminView, model=Admin):
     column_list = [Admin.login, Admin.id]
 
     can_edit = False
     can_create = False
 
 
-class UserAdmin(AdminView, model=User):
+class UserAdmin(PrincipalViewMixin, AdminView, model=User):
     column_list = [User.id, User.username, User.phone]
 
 
-class LocationAdmin(AdminView, model=Location):
+class LocationAdmin(AvailabilityViewMixin, AdminView, model=Location):
     column_list = [Location.name, Location.address, Location.admin]
 
+    async def invalidate_index(self, model):
+        availability_index.invalidate(model.id)
 
-class TableAdmin(AdminView, model=Table):
+
+class TableAdmin(AvailabilityViewMixin, AdminView, model=Table):
     column_list = [Table.id, Table.location]
 
 
-class BookingAdmin(AdminView, model=Booking):
+class BookingAdmin(AvailabilityViewMixin, AdminView, model=Booking):
     column_list = [Booking.table, Booking.time_start, Booking.time_end, Booking.table_id]
 
+    async def invalidate_index(self, model):
+        # The booking may have been moved to a table of another location.
+        availability_index.remove(model.id)
+        table = await TableRepository().find_one(id=model.table_id)
+        if table:
+            availability_index.invalidate(table.location_id)
+
 
 class BookingUserAdmin(AdminView, model=BookingUser):
     column_list = [BookingUser.user, BookingUser.booking, BookingUser.status]
@@ -0,0 +1,36 @@
+import importlib
+import pkgutil
+
+from app.infra.database.models import Base
+from sqlalchemy import TIMESTAMP, Column, String
+from sqlalchemy import Table as SqlTable
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+schema_migrations = SqlTable(
+    "schema_migrations",
+    Base.metadata,
+    Column("version", String(120), primary_key=True),
+    Column("applied_at", TIMESTAMP(timezone=False), server_default=func.now()),
+)
+
+
+def get_migrations():
+    """Migration modules of this package, `vNNNN_name.py`, in version order."""
+    names = sorted(
+        name for _, name, _ in pkgutil.iter_modules(__path__) if name.startswith("v")
+    )
+    return [importlib.import_module(f"{__name__}.{name}") for name in names]
+
+
+async def run_migrations(conn: AsyncConnection):
+    applied = set(await conn.scalars(select(schema_migrations.c.version)))
+
+    for migration in get_migrations():
+        version = migration.__name__.rsplit(".", 1)[-1]
+        if version in applied:
+            continue
+
+        await migration.upgrade(conn)
+        await conn.execute(insert(schema_migrations).values(version=version))
+        print(f"Migration {version} applied")
@@ -0,0 +1,52 @@
+"""Adds the booking overlap constraint to databases created before it existed."""
+from app.infra.database.models import BOOKING_NO_OVERLAP_TRIGGERS, BTREE_GIST, Booking
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint
+
+# Pairs of bookings that hold the same table at the same time.
+OVERLAPS = text(
+    "SELECT a.table_id, a.id, b.id, a.time_start, a.time_end, b.time_start, b.time_end "
+    "FROM booking a JOIN booking b ON a.table_id = b.table_id AND a.id < b.id "
+    "AND a.time_start < b.time_end AND b.time_start < a.time_end "
+    "ORDER BY a.table_id, a.time_start LIMIT 20"
+)
+
+
+def check_overlaps(conn):
+    """The constraint can't be added over overlapping bookings, they have to
+    be moved or cancelled by hand first."""
+    overlaps = conn.execute(OVERLAPS).all()
+    if not overlaps:
+        return
+
+    lines = "\n".join(
+        f"  table {table_id}: {first} ({first_start} - {first_end}) "
+        f"and {second} ({second_start} - {second_end})"
+        for table_id, first, second, first_start, first_end, second_start, second_end in overlaps
+    )
+    raise RuntimeError(
+        "Can't add booking_no_overlap while bookings overlap on the same table, "
+        f"move or delete them and restart:\n{lines}"
+    )
+
+
+def upgrade_sync(conn):
+    if conn.dialect.name == "postgresql":
+        BTREE_GIST(Booking.__table__, conn)
+
+        exists = conn.scalar(
+            text("SELECT 1 FROM pg_constraint WHERE conname = 'booking_no_overlap'")
+        )
+        if not exists:
+            check_overlaps(conn)
+            constraint = next(
+                c for c in Booking.__table__.constraints if c.name == "booking_no_overlap"
+            )
+            conn.execute(AddConstraint(constraint))
+
+    for trigger in BOOKING_NO_OVERLAP_TRIGGERS:
+        trigger(Booking.__table__, conn)
+
+
+async def upgrade(conn):
+    await conn.run_sync(upgrade_sync)
@@ -0,0 +1,49 @@
+"""
+Secondary indexes for the hot queries: booking overlap per table, members
+and user bookings, the location queue per day, users by phone, admins by
+login, tables by name and the bookings the EventChecker has yet to announce.
+
+The DDL is frozen here, later changes to the models don't alter what this
+migration creates.
+"""
+from sqlalchemy import text
+
+# (name, table, columns, predicate), `{false}` is the dialect's false literal.
+INDEXES = (
+    ("ix_users_phone", "users", "phone", None),
+    ("ix_admins_login", "admins", "login", None),
+    ("ix_tables_location_id_table_name", "tables", "location_id, table_name", None),
+    ("ix_booking_table_id_time_start", "booking", "table_id, time_start", None),
+    (
+        "ix_booking_pending_start",
+        "booking",
+        "time_start",
+        "notification_for_fronted_about_start = {false}",
+    ),
+    (
+        "ix_booking_pending_end",
+        "booking",
+        "time_end",
+        "notification_for_fronted_about_canceled = {false}",
+    ),
+    ("ix_booking_user_user_id_booking_id", "booking_user", "user_id, booking_id", None),
+    ("ix_booking_user_booking_id", "booking_user", "booking_id", None),
+    ("ix_queue_user_location_id_date", "queue_user", "location_id, date", None),
+)
+
+
+def create_indexes(conn, indexes):
+    false = "false" if conn.dialect.name == "postgresql" else "0"
+    for name, table, columns, predicate in indexes:
+        ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+        if predicate:
+            ddl += " WHERE " + predicate.format(false=false)
+        conn.execute(text(ddl))
+
+
+def upgrade_sync(conn):
+    create_indexes(conn, INDEXES)
+
+
+async def upgrade(conn):
+    await conn.run_sync(upgrade_sync)
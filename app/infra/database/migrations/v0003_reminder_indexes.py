@@ -0,0 +1,28 @@
+"""
+Partial indexes for the Telegram start and end reminders, so every kind of
+notification the EventChecker looks up is an index range scan.
+"""
+from app.infra.database.migrations.v0002_hot_path_indexes import create_indexes
+
+INDEXES = (
+    (
+        "ix_booking_pending_start_reminder",
+        "booking",
+        "time_start",
+        "notification_sent_start = {false}",
+    ),
+    (
+        "ix_booking_pending_end_reminder",
+        "booking",
+        "time_end",
+        "notification_sent = {false}",
+    ),
+)
+
+
+def upgrade_sync(conn):
+    create_indexes(conn, INDEXES)
+
+
+async def upgrade(conn):
+    await conn.run_sync(upgrade_sync)
@@ -0,0 +1,12 @@
+"""Adds the floor plan hash to locations created before it existed."""
+from sqlalchemy import inspect, text
+
+
+def upgrade_sync(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("locations")}
+    if "svg_hash" not in columns:
+        conn.execute(text("ALTER TABLE locations ADD COLUMN svg_hash VARCHAR(64)"))
+
+
+async def upgrade(conn):
+    await conn.run_sync(upgrade_sync)
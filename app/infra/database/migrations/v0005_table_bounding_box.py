@@ -0,0 +1,15 @@
+"""Adds the floor plan bounding box to tables created before it existed."""
+from sqlalchemy import inspect, text
+
+COLUMNS = ("x", "y", "width", "height")
+
+
+def upgrade_sync(conn):
+    existing = {column["name"] for column in inspect(conn).get_columns("tables")}
+    for name in COLUMNS:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE tables ADD COLUMN {name} FLOAT"))
+
+
+async def upgrade(conn):
+    await conn.run_sync(upgrade_sync)
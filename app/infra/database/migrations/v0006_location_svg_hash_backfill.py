@@ -0,0 +1,19 @@
+"""Hashes the floor plans uploaded before locations kept the hash."""
+import hashlib
+
+from app.infra.s3.storage import Storage
+from sqlalchemy import text
+
+
+async def upgrade(conn):
+    storage = Storage("locations")
+    ids = await conn.scalars(text("SELECT id FROM locations WHERE svg_hash IS NULL"))
+
+    for location_id in ids.all():
+        svg = await storage.read_file(f"{location_id}.svg")
+        if not svg:
+            continue
+        await conn.execute(
+            text("UPDATE locations SET svg_hash = :digest WHERE id = :id"),
+            {"digest": hashlib.sha256(svg).hexdigest(), "id": location_id},
+        )
@@ -1,22 +1,30 @@
 import enum
 import uuid
 from datetime import datetime
+from functools import lru_cache
 from os import getenv
 from random import randint
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 from sqlalchemy import (
+    DDL,
     JSON,
     TIMESTAMP,
     BigInteger,
     Boolean,
     DateTime,
     Enum,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
+    column,
+    event,
     func,
+    text,
 )
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -34,6 +42,8 @@ def generate_code():
     return str(randint(0, 9999)).zfill(4)
 
 
+# Relationships are never loaded implicitly (`lazy="raise"`), every query
+# asks for what it needs through a profile in app/infra/repository/profiles.py.
 class Base(AsyncAttrs, DeclarativeBase):
     __abstract__ = True
 
@@ -49,7 +59,12 @@ class Base(AsyncAttrs, DeclarativeBase):
     )
 
     def to_dict(self) -> Dict[str, Any]:
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return {name: getattr(self, name) for name in column_names(type(self))}
+
+
+@lru_cache(maxsize=None)
+def column_names(model) -> Tuple[str, ...]:
+    return tuple(c.name for c in model.__table__.columns)
 
 
 class User(Base):
@@ -58,7 +73,7 @@ class User(Base):
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, unique=True)
     first_name = mapped_column(String(120), nullable=False)
     username = mapped_column(String(120), nullable=True)
-    phone = mapped_column(String(20), nullable=True)
+    phone = mapped_column(String(20), nullable=True, index=True)
 
     def __repr__(self):
         return f"{self.id} | {self.username} | {self.first_name} | {self.phone}"
@@ -67,13 +82,15 @@ class User(Base):
 class AdminAuthModel(Base):
     __abstract__ = True
 
-    login = mapped_column(String(120), nullable=False)
+    login = mapped_column(String(120), nullable=False, index=True)
     _password = mapped_column("password", String(100), nullable=False)
 
     @hybrid_property
     def password(self):
         return self._password
 
+    # Hashes on the calling thread; async code goes through
+    # app.services.passwords instead and sets `_password`.
     @password.setter
     def password(self, value):
         self._password = hash_password(value)
@@ -95,15 +112,18 @@ class Location(Base):
     open_hour = mapped_column(Integer, default=0, nullable=False)
     close_hour = mapped_column(Integer, default=24, nullable=False)
 
+    # SHA-256 of the floor plan, its URL changes with the content.
+    svg_hash = mapped_column(String(64), nullable=True)
+
     admin_id = mapped_column(
         ForeignKey("admins.id", ondelete="CASCADE"), nullable=False
     )
-    admin: Mapped[Admin] = relationship(lazy="subquery")
+    admin: Mapped[Admin] = relationship(lazy="raise")
 
     tables: Mapped[list["Table"]] = relationship(
         "Table",
         back_populates="location",
-        lazy="selectin",
+        lazy="raise",
         cascade="all, delete-orphan",
     )
 
@@ -112,20 +132,29 @@ class Location(Base):
 
     @property
     def svg(self):
+        if self.svg_hash:
+            return IMAGES_URL + f"{self.id}/{self.svg_hash}.svg"
         return IMAGES_URL + f"{self.id}.svg"
 
 
 class Table(Base):
     __tablename__ = "tables"
+    __table_args__ = (Index("ix_tables_location_id_table_name", "location_id", "table_name"),)
 
     table_name = mapped_column(String, nullable=False)
     features = mapped_column(JSON, nullable=False, default=[])
     max_people_amount = mapped_column(Integer, default=1, nullable=False)
 
+    # Bounding box on the floor plan, in the SVG's user units.
+    x = mapped_column(Float, nullable=True)
+    y = mapped_column(Float, nullable=True)
+    width = mapped_column(Float, nullable=True)
+    height = mapped_column(Float, nullable=True)
+
     location_id = mapped_column(
         ForeignKey("locations.id", ondelete="CASCADE"), nullable=False
     )
-    location: Mapped[Location] = relationship(lazy="subquery")
+    location: Mapped[Location] = relationship(lazy="raise")
 
     def __repr__(self):
         return self.table_name
@@ -133,11 +162,46 @@ class Table(Base):
 
 class Booking(Base):
     __tablename__ = "booking"
+    __table_args__ = (
+        ExcludeConstraint(
+            ("table_id", "="),
+            (func.tstzrange(column("time_start"), column("time_end")), "&&"),
+            name="booking_no_overlap",
+            using="gist",
+        ).ddl_if(dialect="postgresql"),
+        Index("ix_booking_table_id_time_start", "table_id", "time_start"),
+        # Bookings the EventChecker still has to announce. Index predicates
+        # must be immutable, so "upcoming" is expressed through the flags.
+        Index(
+            "ix_booking_pending_start",
+            "time_start",
+            postgresql_where=text("notification_for_fronted_about_start = false"),
+            sqlite_where=text("notification_for_fronted_about_start = 0"),
+        ),
+        Index(
+            "ix_booking_pending_end",
+            "time_end",
+            postgresql_where=text("notification_for_fronted_about_canceled = false"),
+            sqlite_where=text("notification_for_fronted_about_canceled = 0"),
+        ),
+        Index(
+            "ix_booking_pending_start_reminder",
+            "time_start",
+            postgresql_where=text("notification_sent_start = false"),
+            sqlite_where=text("notification_sent_start = 0"),
+        ),
+        Index(
+            "ix_booking_pending_end_reminder",
+            "time_end",
+            postgresql_where=text("notification_sent = false"),
+            sqlite_where=text("notification_sent = 0"),
+        ),
+    )
 
     table_id = mapped_column(
         ForeignKey("tables.id", ondelete="CASCADE"), nullable=False
     )
-    table: Mapped[Table] = relationship(lazy="subquery")
+    table: Mapped[Table] = relationship(lazy="raise")
 
     time_start = mapped_column(DateTime(timezone=True), nullable=False)
     time_end = mapped_column(DateTime(timezone=True), nullable=False)
@@ -156,7 +220,7 @@ class Booking(Base):
     users: Mapped[list["BookingUser"]] = relationship(
         "BookingUser",
         back_populates="booking",
-        lazy="selectin",
+        lazy="raise",
         cascade="all, delete-orphan",
     )
 
@@ -164,6 +228,28 @@ class Booking(Base):
         return self.id
 
 
+# Postgres needs btree_gist for the `table_id WITH =` part of the exclusion
+# constraint. SQLite has no exclusion constraints, so the same rule is
+# enforced there with triggers that fail with an IntegrityError as well.
+BTREE_GIST = DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(
+    dialect="postgresql"
+)
+BOOKING_NO_OVERLAP_TRIGGERS = [
+    DDL(
+        f"CREATE TRIGGER IF NOT EXISTS booking_no_overlap_{action.lower()} "
+        f"BEFORE {action} ON booking "
+        "WHEN EXISTS (SELECT 1 FROM booking WHERE table_id = NEW.table_id "
+        f"{ignore_self}AND time_start < NEW.time_end AND time_end > NEW.time_start) "
+        "BEGIN SELECT RAISE(ABORT, 'booking_no_overlap'); END"
+    ).execute_if(dialect="sqlite")
+    for action, ignore_self in (("INSERT", ""), ("UPDATE", "AND id != NEW.id "))
+]
+
+event.listen(Base.metadata, "before_create", BTREE_GIST)
+for trigger in BOOKING_NO_OVERLAP_TRIGGERS:
+    event.listen(Booking.__table__, "after_create", trigger)
+
+
 class BookingUserStatusEnum(enum.Enum):
     creator = "creator"
     member = "member"
@@ -171,14 +257,18 @@ class BookingUserStatusEnum(enum.Enum):
 
 class BookingUser(Base):
     __tablename__ = "booking_user"
+    __table_args__ = (
+        Index("ix_booking_user_user_id_booking_id", "user_id", "booking_id"),
+        Index("ix_booking_user_booking_id", "booking_id"),
+    )
 
     user_id = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    user: Mapped[User] = relationship(lazy="subquery")
+    user: Mapped[User] = relationship(lazy="raise")
 
     booking_id = mapped_column(
         ForeignKey("booking.id", ondelete="CASCADE"), nullable=False
     )
-    booking: Mapped[Booking] = relationship(lazy="subquery")
+    booking: Mapped[Booking] = relationship(lazy="raise")
 
     status = mapped_column(
         Enum(BookingUserStatusEnum),
@@ -194,14 +284,15 @@ class BookingUser(Base):
 
 class QueueUser(Base):
     __tablename__ = "queue_user"
+    __table_args__ = (Index("ix_queue_user_location_id_date", "location_id", "date"),)
 
     user_id = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    user: Mapped[User] = relationship(lazy="subquery")
+    user: Mapped[User] = relationship(lazy="raise")
 
     location_id = mapped_column(
         ForeignKey("locations.id", ondelete="CASCADE"), nullable=False
     )
-    location: Mapped[Location] = relationship(lazy="subquery")
+    location: Mapped[Location] = relationship(lazy="raise")
 
     date = mapped_column(DateTime(timezone=True), nullable=True, default=None)
     hours = mapped_column(Integer, nullable=False)
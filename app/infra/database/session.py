@@ -1,12 +1,131 @@
+import asyncio
+import inspect
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
 
 from app.config import ENGINE, TIMEZONE
+from app.infra.database.migrations import run_migrations
 from app.infra.database.models import Base
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 engine = create_async_engine(url=ENGINE, echo=False, pool_size=20)
-async_session = async_sessionmaker(engine)
+session_factory = async_sessionmaker(engine)
+
+
+class UnitOfWork:
+    __slots__ = ("session", "task", "callbacks")
+
+    def __init__(self, session: AsyncSession, task: asyncio.Task):
+        self.session = session
+        self.task = task
+        # Side effects to run once the work is committed, see after_commit().
+        self.callbacks: List[Tuple[Callable[..., Any], tuple]] = []
+
+    def run_callbacks(self):
+        for callback, args in self.callbacks:
+            run_callback(callback, args)
+        self.callbacks.clear()
+
+
+current_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar(
+    "current_unit_of_work", default=None
+)
+
+
+class SharedSession:
+    """The unit of work session as a repository sees it.
+
+    `commit()` only flushes, the unit of work commits once at the end, and
+    leaving `async with` keeps the session open.
+    """
+
+    __slots__ = ("session",)
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def commit(self):
+        await self.session.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+def get_unit_of_work() -> Optional[UnitOfWork]:
+    """The unit of work of the running task, if any."""
+    unit_of_work = current_unit_of_work.get()
+    if unit_of_work is not None and unit_of_work.task is asyncio.current_task():
+        return unit_of_work
+    return None
+
+
+def run_callback(callback: Callable[..., Any], args: tuple):
+    try:
+        result = callback(*args)
+        # Coroutines are side effects of their own, they do not hold anyone up.
+        if inspect.isawaitable(result):
+            asyncio.ensure_future(result)
+    except Exception as e:
+        print(f"after_commit callback {callback!r} failed: {e!r}")
+
+
+def after_commit(callback: Callable[..., Any], *args):
+    """Calls `callback(*args)` once the current unit of work has committed,
+    and never if it rolls back. Outside of a unit of work every write is
+    committed already, the call happens right away.
+
+    Index updates, notifications and background tasks go through here, so
+    nobody sees a change before it is in the database.
+    """
+    unit_of_work = get_unit_of_work()
+    if unit_of_work is None:
+        run_callback(callback, args)
+    else:
+        unit_of_work.callbacks.append((callback, args))
+
+
+class ScopedSessionmaker:
+    """`async_session()` of the repositories: the current unit of work's
+    session, or a session of its own outside of one.
+
+    Tasks spawned from a request inherit its context but not its session,
+    an AsyncSession must not be used by two tasks at once.
+    """
+
+    def __call__(self):
+        unit_of_work = get_unit_of_work()
+        if unit_of_work is not None:
+            return SharedSession(unit_of_work.session)
+        return session_factory()
+
+
+async_session = ScopedSessionmaker()
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """Runs every repository call inside on one session and commits once."""
+    async with session_factory(expire_on_commit=False) as session:
+        work = UnitOfWork(session, asyncio.current_task())
+        token = current_unit_of_work.set(work)
+        try:
+            yield session
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+        finally:
+            current_unit_of_work.reset(token)
+        work.run_callbacks()
 
 
 async def run_database(reset: bool):
@@ -24,6 +143,7 @@ async def run_database(reset: bool):
             )
 
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
 
     from app.infra.database.init_db import init
     await init()
@@ -0,0 +1,71 @@
+from typing import Callable, Dict, List
+
+from app.config import ENGINE, EVENT_BUS
+
+Handler = Callable[[str, dict], None]
+
+# Events for WebSocket clients. Other topics carry state shared between
+# workers and never reach the sockets.
+LOCATION_EVENTS = "location"
+
+
+class EventBus:
+    """Location events shared by every worker process.
+
+    `publish()` hands an event to the backend, and every worker, this one
+    included, gets it back through the handlers registered with
+    `subscribe()` for the message's topic.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, List[Handler]] = {}
+        self.reconnect_handlers: List[Callable[[], None]] = []
+
+    def subscribe(self, handler: Handler, topic: str = LOCATION_EVENTS):
+        self.handlers.setdefault(topic, []).append(handler)
+
+    def on_reconnect(self, handler: Callable[[], None]):
+        """Called when messages from other workers may have been missed."""
+        self.reconnect_handlers.append(handler)
+
+    async def start(self): ...
+
+    async def stop(self): ...
+
+    async def is_leader(self) -> bool:
+        """Whether this worker runs the jobs that must run only once."""
+        return True
+
+    async def publish(
+        self, location_id: str, message: dict, topic: str = LOCATION_EVENTS
+    ) -> bool:
+        """False if the message was delivered to this worker only."""
+        raise NotImplementedError
+
+    def deliver(self, location_id: str, message: dict, topic: str = LOCATION_EVENTS):
+        for handler in self.handlers.get(topic, ()):
+            try:
+                handler(location_id, message)
+            except Exception as e:
+                print(f"Error delivering event for location ({location_id}): {e}")
+
+
+class MemoryEventBus(EventBus):
+    """Delivers within the current process only: one worker and tests."""
+
+    async def publish(
+        self, location_id: str, message: dict, topic: str = LOCATION_EVENTS
+    ) -> bool:
+        self.deliver(location_id, message, topic)
+        return True
+
+
+def create_event_bus() -> EventBus:
+    if EVENT_BUS == "postgres":
+        from app.infra.events.postgres import PostgresEventBus
+
+        return PostgresEventBus(ENGINE)
+    return MemoryEventBus()
+
+
+event_bus = create_event_bus()
@@ -0,0 +1,133 @@
+import asyncio
+import json
+from typing import Optional
+
+import asyncpg
+
+from app.infra.events.bus import LOCATION_EVENTS, EventBus
+
+CHANNEL = "location_events"
+# Session advisory lock held by the worker that runs the event checker.
+LEADER_LOCK = 7_401_011
+# NOTIFY payloads are limited to 8000 bytes.
+MAX_PAYLOAD = 7900
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 30
+
+
+class PostgresEventBus(EventBus):
+    """Events over Postgres `LISTEN/NOTIFY`.
+
+    Every worker keeps one connection listening on `CHANNEL`. Publishing is
+    a `pg_notify()` on a second connection, and the event comes back to all
+    listeners, this worker included. Until the listener is up, and while it
+    reconnects, this worker gets its events delivered locally.
+
+    The listener connection also holds `LEADER_LOCK` for the worker that
+    leads, so the lock goes away together with the connection.
+    """
+
+    def __init__(self, engine_url: str):
+        super().__init__()
+        self.dsn = engine_url.replace("+asyncpg", "")
+        self.listener: Optional[asyncpg.Connection] = None
+        self.publisher: Optional[asyncpg.Connection] = None
+        self.publish_lock = asyncio.Lock()
+        self.reconnect: Optional[asyncio.Task] = None
+        self.stopped = False
+        self.leader = False
+
+    async def start(self):
+        self.stopped = False
+        try:
+            await self._listen()
+        except Exception as e:
+            print(f"Event bus listener not connected: {e}")
+            self._reconnect()
+
+    async def stop(self):
+        self.stopped = True
+        if self.reconnect:
+            self.reconnect.cancel()
+
+        for conn in (self.listener, self.publisher):
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        self.listener = self.publisher = None
+        self.leader = False
+
+    async def is_leader(self) -> bool:
+        if self.listener is None or self.listener.is_closed():
+            self.leader = False
+        elif not self.leader:
+            try:
+                self.leader = await self.listener.fetchval(
+                    "SELECT pg_try_advisory_lock($1)", LEADER_LOCK
+                )
+            except Exception as e:
+                print(f"Event bus leader lock failed: {e}")
+        return self.leader
+
+    async def publish(
+        self, location_id: str, message: dict, topic: str = LOCATION_EVENTS
+    ) -> bool:
+        payload = json.dumps(
+            {"topic": topic, "location_id": location_id, "message": message},
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+
+        listening = self.listener is not None and not self.listener.is_closed()
+        if not listening:
+            # This worker would not hear its own NOTIFY, the others still may.
+            self.deliver(location_id, message, topic)
+        if len(payload.encode()) > MAX_PAYLOAD:
+            print(f"Event for location ({location_id}) is too large for NOTIFY, delivered locally")
+            if listening:
+                self.deliver(location_id, message, topic)
+            return False
+
+        try:
+            async with self.publish_lock:
+                if self.publisher is None or self.publisher.is_closed():
+                    self.publisher = await asyncpg.connect(self.dsn)
+                await self.publisher.execute("SELECT pg_notify($1, $2)", CHANNEL, payload)
+        except Exception as e:
+            print(f"Event bus publish failed, delivered locally: {e}")
+            if listening:
+                self.deliver(location_id, message, topic)
+            return False
+        return True
+
+    async def _listen(self):
+        self.leader = False
+        self.listener = await asyncpg.connect(self.dsn)
+        self.listener.add_termination_listener(lambda _: self._reconnect())
+        await self.listener.add_listener(CHANNEL, self._on_notify)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        event = json.loads(payload)
+        self.deliver(
+            event["location_id"], event["message"], event.get("topic", LOCATION_EVENTS)
+        )
+
+    def _reconnect(self):
+        self.leader = False
+        if self.stopped or (self.reconnect and not self.reconnect.done()):
+            return
+        self.reconnect = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        delay = RECONNECT_DELAY
+        while not self.stopped:
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+                print("Event bus listener reconnected")
+                for handler in self.reconnect_handlers:
+                    handler()
+                return
+            except Exception as e:
+                print(f"Event bus listener reconnect failed: {e}")
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
@@ -19,14 +19,11 @@ class BaseRepository(Generic[M]):
             await session.refresh(item)
             return item
 
-    async def get(self, id, options=None) -> M:
+    async def get(self, id, options=()) -> M:
         async with self.session() as session:
-            # if options is not None:
-            #     return await session.scalar(
-            #         select(self.model).options(*options).where(self.model.id == id)
-            #     )
-
-            return await session.scalar(select(self.model).where(self.model.id == id))
+            return await session.scalar(
+                select(self.model).options(*options).where(self.model.id == id)
+            )
 
     async def get_or_create(self, id, **kwargs):
         item = await self.get(id)
@@ -34,10 +31,11 @@ class BaseRepository(Generic[M]):
             return await self.create(id=id, **kwargs)
         return item
 
-    async def find(self, limit=None, offset=None, **conditions) -> List[M]:
+    async def find(self, limit=None, offset=None, options=(), **conditions) -> List[M]:
         async with self.session() as session:
             items = await session.scalars(
                 select(self.model)
+                .options(*options)
                 .filter_by(**conditions)
                 .limit(limit)
                 .offset(offset)
@@ -45,8 +43,8 @@ class BaseRepository(Generic[M]):
             )
             return items.all()
 
-    async def find_one(self, **conditions) -> M:
-        results = await self.find(limit=1, **conditions)
+    async def find_one(self, options=(), **conditions) -> M:
+        results = await self.find(limit=1, options=options, **conditions)
 
         if results:
             return results[0]
@@ -61,17 +59,20 @@ class BaseRepository(Generic[M]):
             )
             return items.all()
 
-    async def update(self, id, **updates) -> M:
+    async def update(self, id, options=(), **updates) -> M:
         async with self.session() as session:
-            item = await session.scalar(select(self.model).where(self.model.id == id))
+            query = select(self.model).options(*options).where(self.model.id == id)
+            item = await session.scalar(query)
 
             for k, v in updates.items():
                 setattr(item, k, v)
 
             await session.commit()
-            await session.refresh(item)
-
-            return item
+            # Reloaded through the same query, so the relationships of the
+            # profile are there again after the commit expired them.
+            return await session.scalar(
+                query.execution_options(populate_existing=True)
+            )
 
     async def delete(self, id):
         async with self.session() as session:
@@ -1,7 +1,15 @@
-from app.infra.database.models import Booking, BookingUser, Location, Table, User
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from app.infra.database.models import (Booking, BookingUser,
+                                       BookingUserStatusEnum, QueueUser, Table,
+                                       User, generate_code, generate_uuid)
 from app.infra.database.session import async_session
 from app.infra.repository._base import BaseRepository
-from sqlalchemy import Date, cast, func, select
+from app.infra.repository.profiles import BOOKING_WITH_TABLE
+from app.utils.occupancy import normalize
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
 
 
 class BookingRepository(BaseRepository[Booking]):
@@ -9,52 +17,231 @@ class BookingRepository(BaseRepository[Booking]):
     session = async_session
 
     async def create_booking(self, table_id, time_start, time_end, features, comment, people_amount, location_id, table_name, user_id):
-        async with self.session() as session:
-            query = (
-                select(BookingUser)
-                .join(Booking)
-                .join(Table)
-                .filter(
-                    Location.id == location_id, 
-                    BookingUser.user_id == user_id,
-                    cast(Booking.time_start, Date) == time_start.date()
-                )
+        day_start = time_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        has_day_booking = (
+            select(BookingUser.id)
+            .join(Booking)
+            .join(Table)
+            .where(
+                Table.location_id == location_id,
+                BookingUser.user_id == user_id,
+                Booking.time_start >= day_start,
+                Booking.time_start < day_start + timedelta(days=1),
             )
-            result = await session.execute(query)
-            existing_bookings = result.scalars().all()
-            if existing_bookings:
-                return 400
-            
-            query = (
-                select(Booking)
-                .join(Table)
-                .filter(
-                    Table.location_id == location_id,
-                    Table.table_name == table_name,
-                )
-                .where(
-                    (Booking.time_start < time_end) &
-                    (Booking.time_end > time_start)
+            .exists()
+        )
+
+        # Overlaps are rejected by the `booking_no_overlap` constraint, so the
+        # only check left runs inside the INSERT itself.
+        booking_id = generate_uuid()
+        values = dict(
+            id=booking_id,
+            code=generate_code(),
+            table_id=table_id,
+            time_start=time_start,
+            time_end=time_end,
+            features=features if features is not None else [],
+            comment=comment,
+            people_amount=people_amount,
+            notification_sent=False,
+            notification_sent_start=False,
+            notification_for_fronted_about_canceled=False,
+            notification_for_fronted_about_start=False,
+        )
+        query = insert(Booking).from_select(
+            list(values),
+            select(
+                *(
+                    literal(value, Booking.__table__.c[key].type)
+                    for key, value in values.items()
                 )
-            )
-            result = await session.execute(query)
-            existing_bookings = result.scalars().all()
-            if existing_bookings:
+            ).where(~has_day_booking),
+        )
+
+        async with self.session() as session:
+            # A savepoint, so a conflict undoes only this insert and not the
+            # rest of the unit of work.
+            try:
+                async with session.begin_nested():
+                    result = await session.execute(query)
+            except IntegrityError:
                 return 409
-            
-            item = self.model(**dict(
-                table_id=table_id,
-                time_start=time_start,
-                time_end=time_end,
-                features=features,
-                comment=comment,
-                people_amount=people_amount,
-            ))
-            session.add(item)
             await session.commit()
-            await session.refresh(item)
-            return item
 
+            if result.rowcount == 0:
+                return 400
+
+            return await session.get(Booking, booking_id, options=BOOKING_WITH_TABLE)
+
+    async def create_queue_bookings(self, location_id: str, bookings: List[dict]):
+        """
+        Creates bookings matched from the queue together with their creators and
+        removes the served queue entries, all in one transaction.
+
+        Bookings whose table was taken meanwhile, or whose user already has a
+        booking in the location that day, are skipped and stay in the queue.
+        """
+        if not bookings:
+            return []
+
+        async with self.session() as session:
+            statuses = await self._check_bookings(session, location_id, bookings)
+            created = [
+                dict(booking, id=generate_uuid(), code=generate_code())
+                for booking, status in zip(bookings, statuses)
+                if status is None
+            ]
+
+            if not created:
+                return []
+
+            try:
+                async with session.begin_nested():
+                    await self._insert_bookings(session, created)
+                    await session.execute(
+                        delete(QueueUser).where(QueueUser.id.in_([b["queue_id"] for b in created]))
+                    )
+            except IntegrityError:
+                # A booking landed on one of the tables after the re-check above,
+                # the entries stay queued for the next cancellation.
+                return []
+            await session.commit()
+            return created
+
+    async def create_bookings(
+        self, location_id: str, bookings: List[dict]
+    ) -> List[Union[dict, int]]:
+        """
+        Creates many bookings of a location with their creators in one
+        transaction.
+
+        Each item gets back the created booking, or the status `create_booking`
+        answers with: 409 when the table is taken, by a stored booking or an
+        earlier item, and 400 when the user already has a booking in the
+        location that day.
+        """
+        if not bookings:
+            return []
+
+        async with self.session() as session:
+            statuses = await self._check_bookings(session, location_id, bookings)
+            results = [
+                dict(booking, id=generate_uuid(), code=generate_code())
+                if status is None
+                else status
+                for booking, status in zip(bookings, statuses)
+            ]
+            created = [result for result in results if isinstance(result, dict)]
+
+            if not created:
+                return results
+
+            try:
+                async with session.begin_nested():
+                    await self._insert_bookings(session, created)
+            except IntegrityError:
+                # Someone booked one of the tables after the check, nothing
+                # of the batch is kept.
+                return [409] * len(bookings)
+            await session.commit()
+            return results
+
+    async def _check_bookings(
+        self, session, location_id: str, bookings: List[dict]
+    ) -> List[Optional[int]]:
+        """None for every booking that can be made, in order, else the
+        status that rejects it. Two queries whatever the number of items."""
+        # Compared as naive UTC, like the rows that come back.
+        windows = [
+            (normalize(b["time_start"]), normalize(b["time_end"])) for b in bookings
+        ]
+        time_from = min(time_start for time_start, _ in windows)
+        time_to = max(time_end for _, time_end in windows)
+
+        taken = await session.execute(
+            select(Booking.table_id, Booking.time_start, Booking.time_end).where(
+                Booking.table_id.in_({b["table_id"] for b in bookings}),
+                Booking.time_start < time_to,
+                Booking.time_end > time_from,
+            )
+        )
+        taken = [
+            (table_id, normalize(time_start), normalize(time_end))
+            for table_id, time_start, time_end in taken
+        ]
+
+        # A user's one booking a day is counted over the day of the requested
+        # time in its own timezone, like `create_booking` does.
+        days = []
+        for b in bookings:
+            day_start = b["time_start"].replace(hour=0, minute=0, second=0, microsecond=0)
+            days.append((normalize(day_start), normalize(day_start + timedelta(days=1))))
+
+        booked_days = await session.execute(
+            select(BookingUser.user_id, Booking.time_start)
+            .join(Booking)
+            .join(Table)
+            .where(
+                Table.location_id == location_id,
+                BookingUser.user_id.in_({b["user_id"] for b in bookings}),
+                Booking.time_start >= min(day_start for day_start, _ in days),
+                Booking.time_start < max(day_end for _, day_end in days),
+            )
+        )
+        booked_starts: Dict[int, List[datetime]] = {}
+        for user_id, time_start in booked_days:
+            booked_starts.setdefault(user_id, []).append(normalize(time_start))
+
+        statuses = []
+        for booking, (start, end), (day_start, day_end) in zip(bookings, windows, days):
+            user_starts = booked_starts.setdefault(booking["user_id"], [])
+            if any(day_start <= time_start < day_end for time_start in user_starts):
+                statuses.append(400)
+                continue
+            if any(
+                table_id == booking["table_id"]
+                and time_start < end
+                and time_end > start
+                for table_id, time_start, time_end in taken
+            ):
+                statuses.append(409)
+                continue
+
+            # Later items are checked against the accepted ones as well.
+            user_starts.append(start)
+            taken.append((booking["table_id"], start, end))
+            statuses.append(None)
+        return statuses
+
+    async def _insert_bookings(self, session, bookings: List[dict]):
+        """Bookings and their creators, one multi-row INSERT each."""
+        await session.execute(
+            insert(Booking),
+            [
+                dict(
+                    id=b["id"],
+                    code=b["code"],
+                    table_id=b["table_id"],
+                    time_start=b["time_start"],
+                    time_end=b["time_end"],
+                    features=b.get("features") or [],
+                    comment=b["comment"],
+                    people_amount=b.get("people_amount", 1),
+                )
+                for b in bookings
+            ],
+        )
+        await session.execute(
+            insert(BookingUser),
+            [
+                dict(
+                    user_id=b["user_id"],
+                    booking_id=b["id"],
+                    status=BookingUserStatusEnum.creator,
+                )
+                for b in bookings
+            ],
+        )
 
     async def get_user_booking_by_user_id(self, user_id: int):
         async with self.session() as session:
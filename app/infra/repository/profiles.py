@@ -0,0 +1,35 @@
+"""Loader profiles: the relationships a query loads together with its rows.
+
+Relationships are `lazy="raise"`, so a caller that touches one its query did
+not ask for fails loudly instead of issuing another statement. Many-to-one
+links are joined into the same statement, collections are loaded with one
+extra `SELECT ... IN` however many rows there are.
+"""
+from app.infra.database.models import Booking, BookingUser, QueueUser, Table
+from sqlalchemy.orm import joinedload, selectinload
+
+# Booking with its table: name, location_id, capacity.
+BOOKING_WITH_TABLE = (joinedload(Booking.table),)
+
+# Booking with its table and the table's location, for the opening hours
+# checks of an update.
+BOOKING_WITH_LOCATION = (joinedload(Booking.table).joinedload(Table.location),)
+
+# Bookings as the admin lists show them: the table and every member's user.
+BOOKING_FOR_ADMIN_LIST = (
+    joinedload(Booking.table),
+    selectinload(Booking.users).joinedload(BookingUser.user),
+)
+
+# A member row with the user it belongs to.
+BOOKING_USER_WITH_USER = (joinedload(BookingUser.user),)
+
+# A table with its location, for the opening hours checks of a new booking.
+TABLE_WITH_LOCATION = (joinedload(Table.location),)
+
+# Location columns only. Neither the admin nor the tables are part of any
+# location response, the tables are listed by their own query.
+LOCATION_SUMMARY = ()
+
+# A queue entry with the location it is queued for.
+QUEUE_WITH_LOCATION = (joinedload(QueueUser.location),)
@@ -1,7 +1,9 @@
 from app.infra.database.models import Location, QueueUser, User
 from app.infra.database.session import async_session
 from app.infra.repository._base import BaseRepository
-from sqlalchemy import Date, cast, select, or_
+from app.infra.repository.profiles import QUEUE_WITH_LOCATION
+from app.utils.occupancy import day_bounds
+from sqlalchemy import select, or_
 
 
 class QueueRepository(BaseRepository[QueueUser]):
@@ -9,21 +11,29 @@ class QueueRepository(BaseRepository[QueueUser]):
     session = async_session
 
     async def get_user_queues_by_day(self, user_id: int, date):
+        day_start, day_end = day_bounds(date)
         async with self.session() as session:
             results = await session.scalars(
                 select(QueueUser).join(User).filter(
-                    cast(QueueUser.date, Date) == date, QueueUser.user_id == user_id)
+                    QueueUser.date >= day_start,
+                    QueueUser.date < day_end,
+                    QueueUser.user_id == user_id,
+                )
             )
             return results.all()
 
     async def get_user_queues(self, user_id: int):
         async with self.session() as session:
             results = await session.scalars(
-                select(QueueUser).join(User).filter(QueueUser.user_id == user_id)
+                select(QueueUser)
+                .options(*QUEUE_WITH_LOCATION)
+                .join(User)
+                .filter(QueueUser.user_id == user_id)
             )
             return results.all()
 
     async def get_location_queues_by_day(self, location_id: str, date):
+        day_start, day_end = day_bounds(date)
         async with self.session() as session:
             results = await session.execute(
                 select(QueueUser)
@@ -32,7 +42,7 @@ class QueueRepository(BaseRepository[QueueUser]):
                     QueueUser.location_id == location_id,
                     or_(
                         QueueUser.date == None,
-                        cast(QueueUser.date, Date) == cast(date, Date)
+                        (QueueUser.date >= day_start) & (QueueUser.date < day_end),
                     )
                 )
                 .order_by(QueueUser.created_at.desc())
@@ -1,9 +1,34 @@
-from datetime import date, datetime
+from datetime import date, datetime, time, timedelta
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Tuple
 
-from app.infra.database.models import Booking, Table, Location
+from app.infra.database.models import Booking, BookingUser, Location, Table, User
 from app.infra.database.session import async_session
 from app.infra.repository._base import BaseRepository
-from sqlalchemy import Date, cast, select
+from app.infra.repository.profiles import BOOKING_FOR_ADMIN_LIST, BOOKING_WITH_TABLE
+from app.utils.occupancy import OccupancyMatrix, day_bounds
+from app.utils.pagination import Cursor
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    delete,
+    desc,
+    insert,
+    literal,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.engine import Row
+
+# Columns a re-uploaded plan may change on a table that stays.
+GEOMETRY = ("x", "y", "width", "height")
+
+
+class TableSync(NamedTuple):
+    kept: int
+    added: int
+    removed: int
 
 
 class TableRepository(BaseRepository[Table]):
@@ -11,43 +36,231 @@ class TableRepository(BaseRepository[Table]):
     session = async_session
 
     async def get_bookings(self, location_id, table_name, date: date):
+        day_start, day_end = day_bounds(date)
         async with self.session() as session:
             results = await session.scalars(
                 select(Booking)
                 .join(Table)
                 .filter(
-                    cast(Booking.time_start, Date) == cast(date, Date),
+                    Booking.time_start >= day_start,
+                    Booking.time_start < day_end,
                     Table.location_id == location_id,
                     Table.table_name == table_name,
                 )
             )
             return results.all()
         
-    async def get_location_bookings(self, location_id: str, admin_id: str):
+    async def get_location_bookings(self, location_id: str, admin_id: str, limit: int = None):
         async with self.session() as session:
             results = await session.scalars(
                 select(Booking)
+                .options(*BOOKING_FOR_ADMIN_LIST)
                 .join(Table)
                 .join(Location)
                 .filter(
                     Table.location_id == location_id,
                     Location.admin_id == admin_id
                 )
+                .order_by(Booking.time_start, Booking.id)
+                .limit(limit)
             )
             return list(results.all())
 
-    async def get_table_bookings(self, table_id: str, admin_id: str):
+    async def sync_location_tables(
+        self, location_id: str, tables: List[Dict[str, Any]]
+    ) -> TableSync:
+        """Makes the tables of a location the given ones, matched by name.
+
+        Tables that stay keep their id, settings and bookings, only their
+        geometry follows the plan. The rest is one DELETE, one multi-row
+        INSERT and one executemany UPDATE, in a single transaction.
+        """
+        async with self.session() as session:
+            rows = await session.execute(
+                select(Table.id, Table.table_name, *(getattr(Table, c) for c in GEOMETRY))
+                .filter(Table.location_id == location_id)
+                .order_by(Table.created_at, Table.id)
+            )
+            existing = {}
+            removed = []
+            for row in rows:
+                # Older uploads could leave a name twice, the first one stays.
+                if row.table_name in existing:
+                    removed.append(row.id)
+                else:
+                    existing[row.table_name] = row
+
+            names = {table["table_name"] for table in tables}
+            removed += [row.id for name, row in existing.items() if name not in names]
+
+            added, moved = [], []
+            for table in tables:
+                row = existing.get(table["table_name"])
+                if row is None:
+                    added.append({**table, "location_id": location_id})
+                elif any(getattr(row, c) != table.get(c) for c in GEOMETRY):
+                    moved.append({"id": row.id, **{c: table.get(c) for c in GEOMETRY}})
+
+            if removed:
+                await session.execute(delete(Table).where(Table.id.in_(removed)))
+            if added:
+                await session.execute(insert(Table), added)
+            if moved:
+                await session.execute(update(Table), moved)
+
+            await session.commit()
+            return TableSync(len(names & existing.keys()), len(added), len(removed))
+
+    async def find_in_area(
+        self, location_id: str, x_min: float, y_min: float, x_max: float, y_max: float
+    ) -> List[Table]:
+        """Tables of a location whose bounding box meets the area."""
         async with self.session() as session:
             results = await session.scalars(
-                select(Booking)
+                select(Table).filter(
+                    Table.location_id == location_id,
+                    Table.x <= x_max,
+                    Table.x + Table.width >= x_min,
+                    Table.y <= y_max,
+                    Table.y + Table.height >= y_min,
+                )
+            )
+            return results.all()
+
+    def _admin_booking_query(
+        self,
+        location_id: str,
+        admin_id: str,
+        table_id: str = None,
+        time_from: datetime = None,
+        time_to: datetime = None,
+        after: Cursor = None,
+        limit: int = None,
+    ):
+        """Bookings of a location, or of one of its tables, with their
+        members as flat rows: one per member, one with NULLs for a booking
+        without any. Ordered by (time_start, id), so the rows of a booking
+        are adjacent and `after` is a keyset position in that order."""
+        filters = [Table.location_id == location_id, Location.admin_id == admin_id]
+        if table_id is not None:
+            filters.append(Table.id == table_id)
+        if time_from is not None:
+            filters.append(Booking.time_end > time_from)
+        if time_to is not None:
+            filters.append(Booking.time_start < time_to)
+        if after is not None:
+            filters.append(tuple_(Booking.time_start, Booking.id) > tuple_(*after))
+
+        if limit is not None:
+            # The page is counted in bookings, not in member rows.
+            page = (
+                select(Booking.id)
+                .join(Table)
+                .join(Location)
+                .filter(*filters)
+                .order_by(Booking.time_start, Booking.id)
+                .limit(limit)
+            )
+            filters = [Booking.id.in_(page)]
+
+        return (
+            select(
+                Booking.id,
+                Table.location_id,
+                Booking.code,
+                Booking.table_id,
+                Table.table_name,
+                Booking.time_start,
+                Booking.time_end,
+                Booking.comment,
+                Booking.features,
+                Booking.people_amount,
+                BookingUser.id.label("member_id"),
+                User.first_name,
+                User.username,
+                BookingUser.user_id,
+                BookingUser.status,
+            )
+            .join(Table)
+            .join(Location)
+            .outerjoin(BookingUser, BookingUser.booking_id == Booking.id)
+            .outerjoin(User, User.id == BookingUser.user_id)
+            .filter(*filters)
+            .order_by(Booking.time_start, Booking.id)
+        )
+
+    async def get_admin_booking_rows(self, location_id: str, admin_id: str, **filters):
+        """One page of `_admin_booking_query`, read at once."""
+        async with self.session() as session:
+            results = await session.execute(
+                self._admin_booking_query(location_id, admin_id, **filters)
+            )
+            return results.all()
+
+    async def stream_admin_booking_rows(
+        self, location_id: str, admin_id: str, batch: int = 500, **filters
+    ) -> AsyncIterator[Row]:
+        """All of `_admin_booking_query` from a server-side cursor, `batch`
+        rows in memory at a time."""
+        async with self.session() as session:
+            results = await session.stream(
+                self._admin_booking_query(location_id, admin_id, **filters)
+                .execution_options(yield_per=batch)
+            )
+            async for row in results:
+                yield row
+
+    async def get_upcoming_bookings(self, location_id: str, time_from: datetime):
+        async with self.session() as session:
+            results = await session.execute(
+                select(
+                    Booking.id, Booking.table_id, Booking.time_start, Booking.time_end
+                )
                 .join(Table)
                 .filter(
-                    Table.id == table_id,
-                    Table.location.has(admin_id == admin_id),
+                    Table.location_id == location_id,
+                    Booking.time_end > time_from,
                 )
             )
             return results.all()
 
+    async def get_busy_matrix(self, location_id: str, windows: List[Tuple[datetime, datetime]]):
+        window_rows = union_all(
+            *(
+                select(
+                    literal(i, Integer).label("idx"),
+                    literal(time_start, DateTime(timezone=True)).label("time_start"),
+                    literal(time_end, DateTime(timezone=True)).label("time_end"),
+                )
+                for i, (time_start, time_end) in enumerate(windows)
+            )
+        ).cte("windows")
+
+        # Bookings of other locations are never joined to the windows.
+        busy = (
+            select(Booking.table_id, window_rows.c.idx)
+            .join(
+                window_rows,
+                (Booking.time_start < window_rows.c.time_end)
+                & (Booking.time_end > window_rows.c.time_start),
+            )
+            .where(
+                Booking.table_id.in_(
+                    select(Table.id).where(Table.location_id == location_id)
+                )
+            )
+            .subquery()
+        )
+
+        async with self.session() as session:
+            results = await session.execute(
+                select(Table.table_name, busy.c.idx)
+                .outerjoin(busy, busy.c.table_id == Table.id)
+                .filter(Table.location_id == location_id)
+                .order_by(Table.table_name)
+            )
+            return results.all()
+
     async def is_table_free(
         self,
         table_name: str,
@@ -85,6 +298,7 @@ class TableRepository(BaseRepository[Table]):
         async with self.session() as session:
             query = (
                 select(Booking)
+                .options(*BOOKING_WITH_TABLE)
                 .join(Table)
                 .filter(
                     Table.location_id == location_id
@@ -111,47 +325,34 @@ class TableRepository(BaseRepository[Table]):
             return tables
 
 
-    async def get_booking_timeline(
-        self,
-        location_id,
-        table_name,
-        date: date,
-        is_two_days: bool = False,
-        ignore: str = None,
-    ):
-        timeline = [0] * (24 if not is_two_days else 48)
+    async def get_occupancy(self, location_id: str, date: date, days: int = 1):
+        time_start = datetime.combine(date, time())
+        time_end = time_start + timedelta(days=days)
 
-        for i in range(0, 2):
-            new_date = date.replace(day=date.day + i)
-            bookings = await self.get_bookings(
-                location_id=location_id, table_name=table_name, date=new_date
+        async with self.session() as session:
+            results = await session.execute(
+                select(
+                    Table.id,
+                    Table.table_name,
+                    Table.max_people_amount,
+                    Booking.time_start,
+                    Booking.time_end,
+                )
+                .outerjoin(
+                    Booking,
+                    (Booking.table_id == Table.id)
+                    & (Booking.time_start < time_end)
+                    & (Booking.time_end > time_start),
+                )
+                .filter(Table.location_id == location_id)
+                .order_by(desc(Table.created_at))
             )
+            return OccupancyMatrix.from_rows(time_start, 24 * days, results.all())
 
-            for book in bookings:
-                if book.id == ignore:
-                    continue
-                time_start: datetime = book.time_start
-                time_end: datetime = book.time_end
-
-                for j in range(time_start.hour, time_end.hour):
-                    timeline[24 * i + j] = 1
-
-        return timeline
-    
     async def get_bookings_timelines(
         self, location_id: str, date: datetime, is_two_days: bool = False
     ):
-        tables = await self.find(location_id=location_id)
-
-        timelines = []
-        for i in range(len(tables)):
-            table = tables[i]
-            timeline = await self.get_booking_timeline(
-                location_id=location_id,
-                table_name=table.table_name,
-                date=date,
-                is_two_days=is_two_days,
-            )
-            timelines.append(timeline)
-
-        return timelines
+        occupancy = await self.get_occupancy(
+            location_id, date, days=2 if is_two_days else 1
+        )
+        return occupancy.timelines()
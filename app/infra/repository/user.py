@@ -1,8 +1,15 @@
+from typing import Set
+
 from app.infra.database.models import User
 from app.infra.database.session import async_session
 from app.infra.repository._base import BaseRepository
+from sqlalchemy import select
 
 
 class UserRepository(BaseRepository[User]):
     model = User
     session = async_session
+
+    async def existing_ids(self, ids) -> Set[int]:
+        async with self.session() as session:
+            return set(await session.scalars(select(User.id).where(User.id.in_(set(ids)))))
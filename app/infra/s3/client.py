@@ -1,48 +1,114 @@
+import asyncio
 import json
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncGenerator, Dict, Optional, Set
 
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
-from app.config import MINIO_ROOT_PASSWORD, MINIO_ROOT_USER, MINIO_URL
+from app.config import (
+    MINIO_ROOT_PASSWORD,
+    MINIO_ROOT_USER,
+    MINIO_URL,
+    S3_MAX_CONNECTIONS,
+)
 from botocore.exceptions import ClientError
 from types_aiobotocore_s3.client import S3Client
 
 
-@asynccontextmanager
-async def get_client(bucket_name) -> AsyncGenerator["S3Client", None]:
-    session = get_session()
-    config = dict(
-        aws_access_key_id=MINIO_ROOT_USER,
-        aws_secret_access_key=MINIO_ROOT_PASSWORD,
-        endpoint_url=MINIO_URL,
+def public_read_policy(bucket_name: str) -> str:
+    return json.dumps(
+        {
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Action": ["s3:GetObject"],
+                    "Effect": "Allow",
+                    "Principal": {"AWS": ["*"]},
+                    "Resource": [f"arn:aws:s3:::{bucket_name}/*"],
+                    "Sid": "",
+                }
+            ],
+        }
     )
 
-    async with session.create_client("s3", **config) as client:
-        client: S3Client
-        try:
-            await client.head_bucket(Bucket=bucket_name)
-        except ClientError as e:
-            if e.response["Error"]["Code"] == "404":
-                await client.create_bucket(Bucket=bucket_name)
 
+class S3:
+    """The S3 client of the process.
+
+    Created once, with a pool of keep-alive connections, and closed in the
+    app lifespan. Buckets are checked, and created if missing, once per
+    process; a `NoSuchBucket` afterwards makes the next call check again.
+    """
+
+    def __init__(self):
+        self.client: Optional[S3Client] = None
+        self.stack: Optional[AsyncExitStack] = None
+        self.buckets: Set[str] = set()
+        self.bucket_locks: Dict[str, asyncio.Lock] = {}
+        self.lock = asyncio.Lock()
+
+    async def start(self) -> S3Client:
+        async with self.lock:
+            if self.client is None:
+                stack = AsyncExitStack()
+                self.client = await stack.enter_async_context(
+                    get_session().create_client(
+                        "s3",
+                        aws_access_key_id=MINIO_ROOT_USER,
+                        aws_secret_access_key=MINIO_ROOT_PASSWORD,
+                        endpoint_url=MINIO_URL,
+                        config=AioConfig(max_pool_connections=S3_MAX_CONNECTIONS),
+                    )
+                )
+                self.stack = stack
+        return self.client
+
+    async def stop(self):
+        async with self.lock:
+            if self.stack is not None:
+                await self.stack.aclose()
+            self.client = None
+            self.stack = None
+            self.buckets.clear()
+
+    async def ensure_bucket(self, bucket_name: str):
+        if bucket_name in self.buckets:
+            return
+
+        # Requests racing on a cold start check the bucket once, the rest wait.
+        async with self.bucket_locks.setdefault(bucket_name, asyncio.Lock()):
+            if bucket_name in self.buckets:
+                return
+
+            client = await self.start()
+            try:
+                await client.head_bucket(Bucket=bucket_name)
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "404":
+                    raise
+
+                try:
+                    await client.create_bucket(Bucket=bucket_name)
+                except ClientError as e:
+                    # Another worker process created it in the meantime.
+                    if e.response["Error"]["Code"] != "BucketAlreadyOwnedByYou":
+                        raise
                 await client.put_bucket_policy(
-                    Bucket=bucket_name,
-                    Policy=json.dumps(
-                        {
-                            "Version": "2012-10-17",
-                            "Statement": [
-                                {
-                                    "Action": ["s3:GetObject"],
-                                    "Effect": "Allow",
-                                    "Principal": {"AWS": ["*"]},
-                                    "Resource": [f"arn:aws:s3:::{bucket_name}/*"],
-                                    "Sid": "",
-                                }
-                            ],
-                        }
-                    ),
+                    Bucket=bucket_name, Policy=public_read_policy(bucket_name)
                 )
 
-            raise
+            self.buckets.add(bucket_name)
+
 
-        yield client
+s3 = S3()
+
+
+@asynccontextmanager
+async def get_client(bucket_name) -> AsyncGenerator["S3Client", None]:
+    await s3.ensure_bucket(bucket_name)
+    try:
+        yield s3.client
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchBucket":
+            s3.buckets.discard(bucket_name)
+        raise
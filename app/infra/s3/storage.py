@@ -6,15 +6,17 @@ class Storage:
     def __init__(self, bucket_name):
         self.bucket_name = bucket_name
 
-    async def upload_file(self, file: bytes, filename: str):
+    async def upload_file(self, file: bytes, filename: str) -> bool:
         try:
             async with get_client(self.bucket_name) as client:
                 await client.put_object(
                     Bucket=self.bucket_name, Key=filename, Body=file
                 )
                 print(f"File {filename} uploaded to {self.bucket_name}")
+                return True
         except ClientError as e:
             print(f"Error uploading file: {e}")
+            return False
 
     async def delete_file(self, filename: str):
         try:
@@ -4,11 +4,23 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 from app.api import router
+from app.api.routes.images import router as images_router
 from app.bot import process_update, run_bot_webhook
-from app.config import RESET, TELEGRAM_BOT_TOKEN
+from app.config import (
+    RESET,
+    TELEGRAM_BOT_TOKEN,
+    TEST_MODE,
+    WS_PING_INTERVAL,
+    WS_PING_TIMEOUT,
+)
 from app.infra.admin import Admin
 from app.infra.database.session import engine, run_database
-from app.services.event_checker import EventChecker
+from app.infra.events.bus import event_bus
+from app.infra.s3.client import s3
+from app.services.event_checker import event_checker
+from app.services.floor_plans import floor_plan_parser
+from app.services.notification import notification_service
+from app.services.passwords import password_hasher
 from fastapi import FastAPI, HTTPException
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
@@ -17,17 +29,25 @@ from fastapi.responses import JSONResponse, RedirectResponse
 
 
 async def on_startup(_):
+    await s3.start()
     await run_database(RESET)
 
     if TELEGRAM_BOT_TOKEN:
         await run_bot_webhook()
 
-    checker = EventChecker()
-    await checker.start()
+    await event_bus.start()
+    await floor_plan_parser.start()
+    await notification_service.start()
+    await event_checker.start()
 
     yield
 
-    checker.scheduler.shutdown()
+    await event_checker.stop()
+    await notification_service.stop()
+    await event_bus.stop()
+    password_hasher.shutdown()
+    floor_plan_parser.shutdown()
+    await s3.stop()
 
 
 app = FastAPI(lifespan=on_startup)
@@ -35,6 +55,7 @@ app.add_api_route(
     "/webhook", endpoint=process_update, methods=["post"], include_in_schema=False
 )
 app.include_router(router)
+app.include_router(images_router)
 
 admin = Admin(base_url="/api/admin")
 admin.init(app, engine)
@@ -45,8 +66,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # The admin booking lists put the next page's cursor there.
+    expose_headers=["X-Next-Cursor"],
 )
 
+if TEST_MODE:
+    from app.api.middleware import StatementCountMiddleware
+
+    app.add_middleware(StatementCountMiddleware)
+
 
 @app.get("/", include_in_schema=False)
 async def redirect_to_docs():
@@ -73,4 +101,11 @@ async def http_exception_handler(_, exc: HTTPException):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8080, forwarded_allow_ips="*")
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8080,
+        forwarded_allow_ips="*",
+        ws_ping_interval=WS_PING_INTERVAL,
+        ws_ping_timeout=WS_PING_TIMEOUT,
+    )
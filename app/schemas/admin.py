@@ -19,3 +19,24 @@ class AdminSignInResponse(BaseModel):
 
 class AdminMe(BaseModel):
     login: str
+
+
+class NotificationStats(BaseModel):
+    queue_depth: int
+    sent: int
+    failed: int
+    retried: int
+    dropped: int
+    latency_avg: float
+    latency_p95: float
+    latency_max: float
+
+
+class PasswordHashingStats(BaseModel):
+    workers: int
+    waiting: int
+    hashed: int
+    verified: int
+    queue_time_avg: float
+    queue_time_p95: float
+    queue_time_max: float
@@ -2,7 +2,8 @@ from datetime import datetime
 from typing import List, Optional
 
 from app.schemas._base import Date, RequestModel
-from pydantic import BaseModel, Field, conint, constr
+from pydantic import BaseModel, Field, TypeAdapter, conint, constr
+from typing_extensions import TypedDict
 
 
 class UpdateBooking(RequestModel):
@@ -28,6 +29,27 @@ class CreateBookingAdmin(RequestModel):
     people_amount: int = 1
     phone_number: str
 
+class CreateBookingItem(RequestModel):
+    table_id: str = Field(description="Айдишник места")
+    user_id: int = Field(description="Telegram id создателя брони")
+    time_start: Date = Field(description="Дата начала, минуты и секунды обрезаются")
+    hours: conint(ge=1, le=12)  # type: ignore
+    features: List[constr(max_length=520)] = None  # type: ignore
+    comment: Optional[constr(max_length=520)] = None  # type: ignore
+    people_amount: int = 1
+
+
+class CreateBookingsBulk(RequestModel):
+    bookings: List[CreateBookingItem] = Field(min_length=1, max_length=1000)
+
+
+class BulkBookingResult(BaseModel):
+    status: int = Field(..., description="201, если бронь создана, иначе код ошибки")
+    detail: Optional[str] = Field(None, description="Причина отказа")
+    id: Optional[str] = Field(None, description="Айдишник созданной брони")
+    code: Optional[str] = Field(None, description="Код для входа")
+
+
 class BookingResponse(BaseModel):
     id: str
     location_id: str
@@ -59,6 +81,34 @@ class BookingAdminResponse(BaseModel):
     people_amount: int
     users: List[UserBookingForAdmin]
 
+
+# BookingAdminResponse as plain dicts. Admin lists are built from trusted
+# query rows and serialized through this adapter without being validated.
+class UserBookingForAdminRow(TypedDict):
+    id: str
+    first_name: str
+    username: Optional[str]
+    user_id: int
+    status: str
+
+
+class BookingAdminRow(TypedDict):
+    id: str
+    location_id: str
+    code: str
+    table_id: str
+    table_name: str
+    time_start: datetime
+    time_end: datetime
+    comment: Optional[str]
+    features: Optional[List[str]]
+    people_amount: int
+    users: List[UserBookingForAdminRow]
+
+
+booking_admin_row = TypeAdapter(BookingAdminRow)
+booking_admin_rows = TypeAdapter(List[BookingAdminRow])
+
 class JoinGroup(RequestModel):
     booking_id: str = Field(
         ..., description="Айдишник брони к которой хотим присоединиться"
@@ -94,3 +144,16 @@ class GroupMembers(RequestModel):
 class GetBusyTables(RequestModel):
     time_start: Date = Field(description="Дата начала, минуты и секунды обрезаются")
     hours: int
+
+
+class GetBusyMatrix(RequestModel):
+    windows: List[GetBusyTables] = Field(
+        min_length=1, max_length=168, description="Промежутки времени, например каждый час дня"
+    )
+
+
+class BusyMatrixResponse(BaseModel):
+    tables: List[str] = Field(..., description="Названия мест, строки матрицы")
+    busy: List[List[int]] = Field(
+        ..., description="Занятость: 1, если место занято в промежутке с тем же индексом"
+    )
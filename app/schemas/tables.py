@@ -15,3 +15,8 @@ class TableResponse(BaseModel):
     max_people_amount: int
     location_id: str
     features: Optional[List[str]] = None
+    # Bounding box on the floor plan.
+    x: Optional[float] = None
+    y: Optional[float] = None
+    width: Optional[float] = None
+    height: Optional[float] = None
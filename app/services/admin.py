@@ -1,6 +1,9 @@
+from typing import Optional
 from uuid import UUID
 
+from app.infra.database.models import Admin
 from app.infra.repository.admin import AdminRepository
+from app.services.passwords import password_hasher
 
 
 class AdminService:
@@ -11,4 +14,14 @@ class AdminService:
         return await self.repo.get(admin_id)
 
     async def create_admin(self, **admin_data: dict):
+        password = admin_data.pop("password", None)
+        if password is not None:
+            # Hashed here, the model setter would hash on the event loop.
+            admin_data["_password"] = await password_hasher.hash(password)
         return await self.repo.create(**admin_data)
+
+    async def authenticate(self, login: str, password: str) -> Optional[Admin]:
+        admin = await self.repo.find_one(login=login)
+        if admin is None or not await password_hasher.verify(password, admin.password):
+            return None
+        return admin
@@ -0,0 +1,312 @@
+import asyncio
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from app.infra.events.bus import event_bus
+from app.infra.repository.table import TableRepository
+from app.utils.occupancy import normalize
+
+# How far back the index keeps bookings when a location is loaded.
+# Windows starting before the horizon are answered from the database.
+HISTORY_HOURS = 24
+# How often a loaded location moves its horizon and drops older bookings.
+PRUNE_INTERVAL = timedelta(hours=1)
+# How long a loaded location is trusted before it is read again, so a change
+# from another worker lost on the bus cannot keep the index wrong for good.
+LOCATION_TTL = timedelta(minutes=10)
+
+# Event bus topic the index changes of every worker are shared on.
+INDEX_TOPIC = "availability"
+
+
+class TableSlots:
+    """Bookings of a single table sorted by start time."""
+
+    __slots__ = ("starts", "ends", "ids")
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        self.ids: List[str] = []
+
+    def add(self, booking_id: str, time_start: datetime, time_end: datetime):
+        i = bisect_left(self.starts, time_start)
+        self.starts.insert(i, time_start)
+        self.ends.insert(i, time_end)
+        self.ids.insert(i, booking_id)
+
+    def remove(self, booking_id: str):
+        if booking_id in self.ids:
+            i = self.ids.index(booking_id)
+            del self.starts[i], self.ends[i], self.ids[i]
+
+    def prune(self, horizon: datetime) -> List[str]:
+        """Drops bookings ending before `horizon`, returns their ids."""
+        # Bookings of one table never overlap, so the ends are sorted too.
+        i = bisect_right(self.ends, horizon)
+        pruned = self.ids[:i]
+        del self.starts[:i], self.ends[:i], self.ids[:i]
+        return pruned
+
+    def is_busy(self, time_start: datetime, time_end: datetime) -> bool:
+        # Bookings of one table never overlap, so the only candidate
+        # is the last booking that starts before the window ends.
+        i = bisect_left(self.starts, time_end)
+        return i > 0 and self.ends[i - 1] > time_start
+
+
+class LocationSlots:
+    __slots__ = ("horizon", "loaded_at", "names", "tables")
+
+    def __init__(self, horizon: datetime):
+        self.horizon = horizon
+        self.loaded_at = time.monotonic()
+        self.names: Dict[str, str] = {}
+        self.tables: Dict[str, TableSlots] = {}
+
+
+class AvailabilityIndex:
+    """In-memory index of upcoming bookings per location.
+
+    A location is read from the database once, on the first request, and is
+    kept up to date by the booking create, update and delete paths afterwards.
+    Each change is published on the event bus, so the other workers apply it
+    to their own copy through `apply()`.
+    """
+
+    def __init__(self):
+        self.origin = uuid4().hex
+        self.repo = TableRepository()
+        self.locations: Dict[str, LocationSlots] = {}
+        self.bookings: Dict[str, Tuple[str, str]] = {}
+        self.generations: Dict[str, int] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    async def get_busy_table_names(
+        self, location_id: str, time_start: datetime, time_end: datetime
+    ) -> Optional[List[str]]:
+        time_start, time_end = normalize(time_start), normalize(time_end)
+
+        location = await self._load(location_id)
+        if location is None or time_start < location.horizon:
+            return None
+
+        return [
+            location.names[table_id]
+            for table_id, slots in location.tables.items()
+            if slots.is_busy(time_start, time_end)
+        ]
+
+    async def get_bookings(
+        self, location_id: str, time_from: datetime
+    ) -> List[Tuple[str, datetime, datetime]]:
+        """`(table_name, time_start, time_end)` of bookings ending after `time_from`."""
+        time_from = normalize(time_from)
+
+        location = await self._load(location_id)
+        if location is None:
+            names = {
+                table.id: table.table_name
+                for table in await self.repo.find(location_id=location_id)
+            }
+            rows = await self.repo.get_upcoming_bookings(location_id, time_from)
+            return [
+                (names[row.table_id], normalize(row.time_start), normalize(row.time_end))
+                for row in rows
+                if row.table_id in names
+            ]
+
+        return [
+            (location.names[table_id], time_start, time_end)
+            for table_id, slots in location.tables.items()
+            for time_start, time_end in zip(slots.starts, slots.ends)
+            if time_end > time_from
+        ]
+
+    def add(self, booking):
+        self.add_slot(
+            booking.table.location_id,
+            booking.table_id,
+            booking.id,
+            booking.time_start,
+            booking.time_end,
+        )
+
+    def add_slot(
+        self,
+        location_id: str,
+        table_id: str,
+        booking_id: str,
+        time_start: datetime,
+        time_end: datetime,
+    ):
+        time_start, time_end = normalize(time_start), normalize(time_end)
+        self._add_slot(location_id, table_id, booking_id, time_start, time_end)
+        self._share(
+            location_id,
+            op="add",
+            table_id=table_id,
+            booking_id=booking_id,
+            time_start=time_start.isoformat(),
+            time_end=time_end.isoformat(),
+        )
+
+    def update(self, booking):
+        self.remove(booking.id)
+        self.add(booking)
+
+    def remove(self, booking_id: str):
+        where = self.bookings.get(booking_id)
+        self._remove(booking_id)
+        # Other workers may hold the booking even if this one does not.
+        self._share(where[0] if where else "", op="remove", booking_id=booking_id)
+
+    def invalidate(self, location_id: str):
+        self._invalidate(location_id)
+        self._share(location_id, op="invalidate")
+
+    def clear(self):
+        """Drops every location, e.g. after changes from other workers were missed."""
+        for location_id in list(self.locations):
+            self._invalidate(location_id)
+
+    def apply(self, location_id: str, message: dict):
+        """Event bus handler for the changes made by other workers."""
+        if message["origin"] == self.origin:
+            return
+
+        if message["op"] == "add":
+            self._add_slot(
+                location_id,
+                message["table_id"],
+                message["booking_id"],
+                datetime.fromisoformat(message["time_start"]),
+                datetime.fromisoformat(message["time_end"]),
+            )
+        elif message["op"] == "remove":
+            self._remove(message["booking_id"])
+        elif message["op"] == "invalidate":
+            self._invalidate(location_id)
+        elif message["op"] == "clear":
+            self.clear()
+
+    def _share(self, location_id: str, **message):
+        message["origin"] = self.origin
+        asyncio.ensure_future(self._publish(location_id, message))
+
+    async def _publish(self, location_id: str, message: dict):
+        if await event_bus.publish(location_id, message, INDEX_TOPIC):
+            return
+
+        # The others missed the change, a small message has them read the
+        # location again. If that is lost too, `LOCATION_TTL` catches up.
+        if message["op"] == "invalidate":
+            return
+        op = "invalidate" if location_id else "clear"
+        await event_bus.publish(location_id, {"op": op, "origin": self.origin}, INDEX_TOPIC)
+
+    def _add_slot(
+        self,
+        location_id: str,
+        table_id: str,
+        booking_id: str,
+        time_start: datetime,
+        time_end: datetime,
+    ):
+        location = self.locations.get(location_id)
+        if location is None:
+            self._touch(location_id)
+            return
+
+        slots = location.tables.get(table_id)
+        if slots is None:
+            self._invalidate(location_id)
+            return
+
+        self._remove(booking_id)
+        slots.add(booking_id, time_start, time_end)
+        self.bookings[booking_id] = (location_id, table_id)
+
+    def _remove(self, booking_id: str):
+        where = self.bookings.pop(booking_id, None)
+        if where is None:
+            return
+
+        location_id, table_id = where
+        self._touch(location_id)
+
+        location = self.locations.get(location_id)
+        if location and table_id in location.tables:
+            location.tables[table_id].remove(booking_id)
+
+    def _invalidate(self, location_id: str):
+        self._touch(location_id)
+        location = self.locations.pop(location_id, None)
+        if location is None:
+            return
+
+        for slots in location.tables.values():
+            for booking_id in slots.ids:
+                self.bookings.pop(booking_id, None)
+
+    def _touch(self, location_id: str):
+        self.generations[location_id] = self.generations.get(location_id, 0) + 1
+
+    def _prune(self, location: LocationSlots):
+        horizon = self._horizon()
+        if horizon - location.horizon < PRUNE_INTERVAL:
+            return
+
+        location.horizon = horizon
+        for slots in location.tables.values():
+            for booking_id in slots.prune(horizon):
+                self.bookings.pop(booking_id, None)
+
+    @staticmethod
+    def _horizon() -> datetime:
+        return normalize(datetime.now(timezone.utc)) - timedelta(hours=HISTORY_HOURS)
+
+    async def _load(self, location_id: str) -> Optional[LocationSlots]:
+        location = self.locations.get(location_id)
+        if location is not None:
+            if time.monotonic() - location.loaded_at < LOCATION_TTL.total_seconds():
+                self._prune(location)
+                return location
+            self._invalidate(location_id)
+
+        lock = self.locks.setdefault(location_id, asyncio.Lock())
+        async with lock:
+            if location_id in self.locations:
+                return self.locations[location_id]
+
+            generation = self.generations.get(location_id, 0)
+            horizon = self._horizon()
+
+            location = LocationSlots(horizon)
+            for table in await self.repo.find(location_id=location_id):
+                location.names[table.id] = table.table_name
+                location.tables[table.id] = TableSlots()
+
+            rows = await self.repo.get_upcoming_bookings(location_id, horizon)
+
+            # A write landed while we were reading, the snapshot may be stale.
+            if self.generations.get(location_id, 0) != generation:
+                return None
+
+            for row in rows:
+                slots = location.tables.get(row.table_id)
+                if slots is None:
+                    continue
+                slots.add(row.id, normalize(row.time_start), normalize(row.time_end))
+                self.bookings[row.id] = (location_id, row.table_id)
+
+            self.locations[location_id] = location
+            return location
+
+
+availability_index = AvailabilityIndex()
+event_bus.subscribe(availability_index.apply, INDEX_TOPIC)
+event_bus.on_reconnect(availability_index.clear)
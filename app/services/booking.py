@@ -1,9 +1,47 @@
 from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
 
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import DEV_MODE
 from app.exceptions import ServiceException
+from app.infra.database.models import Location
+from app.infra.database.session import after_commit
 from app.infra.repository import (BookingRepository, BookingUserRepository,
                                   TableRepository, UserRepository)
-from app.schemas.booking import MyGroupResponse
+from app.schemas.booking import MyGroupResponse, booking_admin_row, booking_admin_rows
+from app.services.availability import availability_index
+from app.services.event_checker import event_checker
+from app.utils.pagination import encode_cursor
+
+# NDJSON lines are sent in chunks of about this many bytes.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def admin_booking(row) -> dict:
+    return dict(
+        id=row.id,
+        location_id=row.location_id,
+        code=row.code,
+        table_id=row.table_id,
+        table_name=row.table_name,
+        time_start=row.time_start,
+        time_end=row.time_end,
+        comment=row.comment,
+        features=row.features,
+        people_amount=row.people_amount,
+        users=[],
+    )
+
+
+def admin_booking_member(row) -> dict:
+    return dict(
+        id=row.member_id,
+        first_name=row.first_name,
+        username=row.username,
+        user_id=row.user_id,
+        status=row.status.value,
+    )
 
 
 class BookingService:
@@ -23,8 +61,64 @@ class BookingService:
         elif booking == 400:
             raise ServiceException(status_code=400, detail="У вас уже есть забронированное место в этой локации.")
         await self.join(user_id=user_id, booking_id=booking.id, status="creator")
+        after_commit(availability_index.add, booking)
+        after_commit(event_checker.wake)
         return booking
 
+    async def create_bookings(self, location: Location, bookings: List[dict]) -> List[dict]:
+        """Creates many bookings of a location in one transaction.
+
+        Every item is a dict of `create_booking` arguments and gets a result
+        in order: the created booking with `status` 201, or the error
+        `status` and `detail` it would have been refused with.
+        """
+        tables = {table.id: table for table in await self.tables.find(location_id=location.id)}
+        users = await self.users.existing_ids(booking["user_id"] for booking in bookings)
+
+        results, accepted = [], []
+        for booking in bookings:
+            table = tables.get(booking["table_id"])
+            hours = (booking["time_end"] - booking["time_start"]) // timedelta(hours=1)
+            if table is None:
+                error = 404, "Место не найдено"
+            elif booking["user_id"] not in users:
+                error = 404, "Пользователь не найден"
+            elif booking["time_start"].hour < location.open_hour:
+                error = 400, "Нельзя забронировать место до открытия коворкинга."
+            elif booking["time_start"].hour + hours > location.close_hour:
+                error = 400, "Нельзя забронировать место после закрытия коворкинга."
+            elif booking["people_amount"] > table.max_people_amount:
+                error = 400, "Нельзя пригласить больше людей, чем вмещает бронь."
+            else:
+                error = None
+                accepted.append(len(results))
+                booking = dict(booking, table_name=table.table_name)
+            results.append(booking if error is None else dict(status=error[0], detail=error[1]))
+
+        created = await self.repo.create_bookings(location.id, [results[i] for i in accepted])
+        for i, booking in zip(accepted, created):
+            if booking == 409:
+                results[i] = dict(status=409, detail="На это время уже есть бронь.")
+            elif booking == 400:
+                results[i] = dict(
+                    status=400,
+                    detail="У пользователя уже есть забронированное место в этой локации.",
+                )
+            else:
+                results[i] = dict(booking, status=201)
+                after_commit(
+                    availability_index.add_slot,
+                    location.id,
+                    booking["table_id"],
+                    booking["id"],
+                    booking["time_start"],
+                    booking["time_end"],
+                )
+
+        if any(result["status"] == 201 for result in results):
+            after_commit(event_checker.wake)
+        return results
+
     async def get_table_bookings(self, table_id, date: date):
         table = await self.tables.get(table_id)
 
@@ -32,11 +126,64 @@ class BookingService:
             location_id=table.location_id, table_name=table.table_name, date=date
         )
     
-    async def get_location_bookings(self, location_id: str, admin_id: str):
+    async def get_location_bookings(self, location_id: str, admin_id: str, limit: int = None):
         return await self.tables.get_location_bookings(
-            location_id=location_id, admin_id=admin_id
+            location_id=location_id, admin_id=admin_id, limit=limit
+        )
+
+    async def get_admin_bookings(
+        self, location_id: str, admin_id: str, limit: int = None, **filters
+    ) -> Tuple[bytes, Optional[str]]:
+        """A page of the admin booking list as JSON, grouped from flat rows
+        in one pass, and the cursor of the next page if there may be one."""
+        rows = await self.tables.get_admin_booking_rows(
+            location_id=location_id, admin_id=admin_id, limit=limit, **filters
         )
 
+        bookings = {}
+        for row in rows:
+            booking = bookings.get(row.id)
+            if booking is None:
+                booking = bookings[row.id] = admin_booking(row)
+            if row.member_id is not None:
+                booking["users"].append(admin_booking_member(row))
+
+        bookings = list(bookings.values())
+        cursor = None
+        if limit is not None and len(bookings) == limit:
+            cursor = encode_cursor(bookings[-1]["time_start"], bookings[-1]["id"])
+
+        # Same output as the response_model path, null fields left out.
+        return booking_admin_rows.dump_json(bookings, exclude_none=True), cursor
+
+    async def stream_admin_bookings(
+        self, location_id: str, admin_id: str, **filters
+    ) -> AsyncIterator[bytes]:
+        """The whole admin booking list as NDJSON, one booking per line.
+
+        Rows come from a server-side cursor and a booking is written out as
+        soon as its last row is read, so memory does not grow with the list.
+        """
+        chunk = bytearray()
+        booking = None
+        async for row in self.tables.stream_admin_booking_rows(
+            location_id=location_id, admin_id=admin_id, **filters
+        ):
+            if booking is None or booking["id"] != row.id:
+                if booking is not None:
+                    chunk += booking_admin_row.dump_json(booking, exclude_none=True) + b"\n"
+                    if len(chunk) >= STREAM_CHUNK_SIZE:
+                        yield bytes(chunk)
+                        chunk.clear()
+                booking = admin_booking(row)
+            if row.member_id is not None:
+                booking["users"].append(admin_booking_member(row))
+
+        if booking is not None:
+            chunk += booking_admin_row.dump_json(booking, exclude_none=True) + b"\n"
+        if chunk:
+            yield bytes(chunk)
+
     async def is_booking_avalale(
         self,
         table_name: str,
@@ -84,6 +231,8 @@ class BookingService:
                 user_id=user_id, booking_id=booking_id, status=status
             )
 
+        # The booking is already at hand, the caller gets it without a query.
+        set_committed_value(booking_user, "booking", booking)
         return booking_user
 
     async def get_user_bookings(self, user_id: int):
@@ -126,19 +275,68 @@ class BookingService:
         return [dict(**m, status=m["status"].value) for m in members]
 
     async def get_busy_table_names(self, location_id, time_start: datetime, hours: int):
+        time_end = time_start + timedelta(hours=hours)
+
+        busy = await availability_index.get_busy_table_names(
+            location_id=location_id, time_start=time_start, time_end=time_end
+        )
+        if busy is None:
+            return await self.get_busy_table_names_from_db(
+                location_id=location_id, time_start=time_start, time_end=time_end
+            )
+
+        if DEV_MODE:
+            await self.check_busy_table_names(
+                location_id=location_id, time_start=time_start, time_end=time_end, busy=busy
+            )
+        return busy
+
+    async def get_busy_matrix(self, location_id, windows: list):
+        windows = [
+            (window.time_start, window.time_start + timedelta(hours=window.hours))
+            for window in windows
+        ]
+
+        tables, busy = [], []
+        for table_name, idx in await self.tables.get_busy_matrix(location_id, windows):
+            if not tables or tables[-1] != table_name:
+                tables.append(table_name)
+                busy.append([0] * len(windows))
+            if idx is not None:
+                busy[-1][idx] = 1
+
+        return dict(tables=tables, busy=busy)
+
+    async def get_busy_table_names_from_db(
+        self, location_id, time_start: datetime, time_end: datetime
+    ):
+        bookings = await self.tables.get_count_bookings(
+            location_id=location_id, time_start=time_start, time_end=time_end
+        )
+        return list({booking.table.table_name for booking in bookings})
+
+    async def check_busy_table_names(
+        self, location_id, time_start: datetime, time_end: datetime, busy: list
+    ):
+        """Compare the index answer with `is_table_free` and report tables that differ."""
         tables = await self.tables.find(location_id=location_id)
 
-        busy = []
+        expected = set()
         for table in tables:
-            time_end = time_start + timedelta(hours=hours)
-
             available = await self.is_booking_avalale(
                 table_name=table.table_name,
                 location_id=table.location_id,
                 time_start=time_start,
                 time_end=time_end,
             )
-
             if not available:
-                busy.append(table.table_name)
-        return busy
+                expected.add(table.table_name)
+
+        mismatched = expected.symmetric_difference(busy)
+        if mismatched:
+            print(
+                f"Availability index mismatch for location {location_id} "
+                f"[{time_start} - {time_end}]: {sorted(mismatched)}"
+            )
+            availability_index.invalidate(location_id)
+        return mismatched
@@ -1,12 +1,15 @@
 import asyncio
-from datetime import datetime, timedelta
+import heapq
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from aiogram import types
 from aiogram.filters.callback_data import CallbackData
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import InstrumentedAttribute, joinedload
 
 from app.config import TIMEZONE
 from app.infra.database.models import (
@@ -16,7 +19,10 @@ from app.infra.database.models import (
     QueueUser,
     Table,
 )
-from app.infra.database.session import async_session
+from app.infra.database.session import async_session, session_factory
+from app.infra.events.bus import event_bus
+from app.services.notification import notification_service
+from app.utils.occupancy import normalize
 from app.utils.websockets import notify_users
 from app.utils.words import get_russion_table_name
 
@@ -26,125 +32,226 @@ class BookingCallbackData(CallbackData, prefix="bc"):
     action: str
 
 
-class EventChecker:
-    def __init__(self):
-        self.tz = TIMEZONE
-        self.scheduler = AsyncIOScheduler(timezone=str(self.tz))
-        self.last_check = datetime.now(self.tz)
-
-    async def start(self):
-        self.scheduler.add_job(
-            self._check_and_notify_bookings, "interval", seconds=5, max_instances=1
-        )
-        self.scheduler.start()
+class Notification(NamedTuple):
+    """A notification is due once `column - lead` has passed and `flag` is unset."""
+
+    kind: str
+    column: InstrumentedAttribute
+    flag: InstrumentedAttribute
+    lead: timedelta
+    notify: str
+
+
+# Leads keep the offsets of the former polling checks, including the three
+# hours booking times are shifted by.
+NOTIFICATIONS = (
+    Notification(
+        "reminder",
+        Booking.time_end,
+        Booking.notification_sent,
+        timedelta(hours=3, minutes=10),
+        "_notify_users",
+    ),
+    Notification(
+        "completed",
+        Booking.time_end,
+        Booking.notification_for_fronted_about_canceled,
+        timedelta(hours=3),
+        "_notify_booking_completion",
+    ),
+    Notification(
+        "start",
+        Booking.time_start,
+        Booking.notification_sent_start,
+        timedelta(hours=4),
+        "_notify_users_about_start",
+    ),
+    Notification(
+        "started",
+        Booking.time_start,
+        Booking.notification_for_fronted_about_start,
+        timedelta(hours=3),
+        "_notify_booking_start",
+    ),
+)
 
-    async def _check_and_notify_bookings(self):
-        async with async_session() as session:
-            try:
-                result = await session.execute(
-                    select(QueueUser).filter(QueueUser.date < datetime.now())
-                )
-                old_records = result.scalars().all()
+# How often the database is asked for notifications coming due, and how far
+# ahead each ask looks. Anything closer is served from the heap.
+REFRESH = timedelta(seconds=30)
 
-                for record in old_records:
-                    await session.delete(record)
 
-                await session.commit()
-                await self._process_active_bookings(session)
-                await self._process_completed_bookings(session)
-                await self._process_start_bookings(session)
-                await self._process_start_booking_notification_for_websocket(session)
+class EventChecker:
+    """Sends booking notifications at their due time.
 
-            except Exception as e:
-                print(f"Error processing bookings: {str(e)}")
+    Every `REFRESH` one indexed query per notification kind loads the bookings
+    that come due before the next refresh into a min-heap of due times, and
+    the loop sleeps until the earliest of them instead of polling.
 
-    async def _process_start_bookings(self, session):
-        now = datetime.now(self.tz)
+    Only the worker that holds the event bus leadership sends anything, the
+    others check again every `REFRESH` in case the leader goes away.
+    """
 
-        start_bookings = await self._get_bookings(
-            session,
-        )
+    def __init__(self):
+        self.heap: List[Tuple[datetime, int, str, str]] = []
+        self.scheduled: Dict[Tuple[str, str], datetime] = {}
+        self.counter = count()
+        self.next_refresh = datetime.min
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
 
-        # print(f"start -- {start_bookings}")
+    async def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+
+    def wake(self):
+        """Refresh right away, e.g. after a booking that may already be due was created."""
+        self.next_refresh = datetime.min
+        self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                if not await event_bus.is_leader():
+                    self._stand_by()
+                    await asyncio.sleep(REFRESH.total_seconds())
+                    continue
+
+                if self._now() >= self.next_refresh:
+                    await self._refresh()
+                await self._dispatch()
+            except Exception as e:
+                print(f"Error processing bookings: {str(e)}")
 
-        def debug(b):
-            # print("_))))0")
-            # print(b.time_start, now + timedelta(hours=4))
-            return (
-                b.time_start <= now + timedelta(hours=4)
-                and b.notification_sent_start == False
-            )
+            await self._sleep()
+
+    def _stand_by(self):
+        # Whatever the heap holds is the leader's job now, a worker that takes
+        # over starts with a fresh refresh.
+        self.heap.clear()
+        self.scheduled.clear()
+        self.next_refresh = datetime.min
+        self.wakeup.clear()
+
+    async def _sleep(self):
+        now = self._now()
+        wake_at = self.next_refresh
+        if self.heap and self.heap[0][0] < wake_at:
+            wake_at = self.heap[0][0]
+
+        timeout = min(max((wake_at - now).total_seconds(), 0), REFRESH.total_seconds())
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        self.wakeup.clear()
+
+    @staticmethod
+    def _now() -> datetime:
+        return normalize(datetime.now(timezone.utc))
+
+    def _schedule(self, kind: str, booking_id: str, due: datetime):
+        key = (kind, booking_id)
+        if self.scheduled.get(key) == due:
+            return
+        # An earlier entry for the same booking stays in the heap and is
+        # skipped when popped, since it no longer matches `scheduled`.
+        self.scheduled[key] = due
+        heapq.heappush(self.heap, (due, next(self.counter), kind, booking_id))
+
+    async def _refresh(self):
+        now = datetime.now(timezone.utc)
+        self.next_refresh = self._now() + REFRESH
 
-        start_bookings = list(
-            filter(
-                debug,
-                start_bookings,
+        async with async_session() as session:
+            await session.execute(
+                delete(QueueUser).where(QueueUser.date < datetime.now())
             )
-        )
-
-        # print(f"filtered start -- {start_bookings}")
-
-        for booking in start_bookings:
-            await self._notify_users_about_start(booking)
-            booking.notification_sent_start = True
             await session.commit()
 
-    async def _process_active_bookings(self, session):
-        now = datetime.now(TIMEZONE)
-
-        notification_time = now + timedelta(hours=3, minutes=10)
-
-        active_bookings = await self._get_bookings(
-            session,
-        )
-
-        # print(f"active -- {active_bookings}")
+            for notification in NOTIFICATIONS:
+                query = select(Booking.id, notification.column).where(
+                    notification.flag == False,
+                    notification.column <= now + notification.lead + REFRESH,
+                )
+                if notification.kind == "reminder":
+                    query = query.where(Booking.time_end > now)
+
+                for booking_id, value in await session.execute(query):
+                    self._schedule(
+                        notification.kind,
+                        booking_id,
+                        normalize(value) - notification.lead,
+                    )
 
-        active_bookings = list(
-            filter(
-                lambda b: b.time_end <= notification_time
-                and b.time_end > now
-                and b.notification_sent == False,
-                active_bookings,
+    def _pop_due(self) -> Dict[str, List[str]]:
+        now = self._now()
+        due: Dict[str, List[str]] = {}
+        while self.heap and self.heap[0][0] <= now:
+            at, _, kind, booking_id = heapq.heappop(self.heap)
+            if self.scheduled.get((kind, booking_id)) != at:
+                continue
+            del self.scheduled[(kind, booking_id)]
+            due.setdefault(kind, []).append(booking_id)
+        return due
+
+    async def _dispatch(self):
+        due = self._pop_due()
+        for notification in NOTIFICATIONS:
+            if notification.kind in due:
+                await self._process(notification, due[notification.kind])
+
+    async def _process(self, notification: Notification, booking_ids: List[str]):
+        """Marks the notifications that are still due as sent, then sends them."""
+        async with session_factory(expire_on_commit=False) as session:
+            bookings = await self._get_bookings(session, notification, booking_ids)
+            now = self._now()
+            sending = []
+
+            for booking in bookings:
+                value = normalize(getattr(booking, notification.column.key))
+
+                # The booking may have been moved since it was scheduled.
+                if value - notification.lead > now:
+                    self._schedule(notification.kind, booking.id, value - notification.lead)
+                    continue
+                if notification.kind == "reminder" and value <= now:
+                    continue
+
+                sending.append(booking)
+
+            if not sending:
+                return
+
+            # The flags are committed before anything goes out: a tick that
+            # fails halfway may lose a notification but never sends one twice.
+            await session.execute(
+                update(Booking)
+                .where(Booking.id.in_([booking.id for booking in sending]))
+                .values({notification.flag.key: True})
+                .execution_options(synchronize_session=False)
             )
-        )
-
-        # print(f"filter active -- {active_bookings}")
-
-        for booking in active_bookings:
-            # print("booking -- ")
-            # print(booking)
-            await self._notify_users(booking)
-            booking.notification_sent = True
             await session.commit()
 
-    async def _process_completed_bookings(self, session):
-        completed_bookings = await self._get_bookings(
-            session,
-        )
-
-        completed_bookings = list(
-            filter(
-                lambda b: b.time_end <= datetime.now(self.tz) + timedelta(hours=3)
-                and b.notification_for_fronted_about_canceled is False,
-                completed_bookings,
+        for booking in sending:
+            try:
+                await getattr(self, notification.notify)(booking)
+            except Exception as e:
+                print(f"Error sending {notification.kind} notification for booking {booking.id}: {e}")
+
+    async def _get_bookings(self, session, notification: Notification, booking_ids: List[str]):
+        stmt = (
+            select(Booking)
+            .where(Booking.id.in_(booking_ids), notification.flag == False)
+            .options(
+                joinedload(Booking.users).joinedload(BookingUser.user),
+                joinedload(Booking.table).joinedload(Table.location),
             )
         )
 
-        for booking in completed_bookings:
-            await self._notify_booking_completion(booking)
-            booking.notification_for_fronted_about_canceled = True
-            await session.commit()
-
-    async def _get_bookings(
-        self,
-        session,
-    ):
-        stmt = select(Booking).options(
-            joinedload(Booking.users).joinedload(BookingUser.user),
-            joinedload(Booking.table).joinedload(Table.location),
-        )
-
         result = await session.execute(stmt)
         return result.unique().scalars().all()
 
@@ -200,19 +307,14 @@ class EventChecker:
             f"• Начало через: {minutes_until_start}мин\n"
         )
 
-        from app.bot import get_bot
-
         print(f"---> send notif about start for user ({chat_id}) and message {message}")
         
-        try:
-            await get_bot().send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=builder.as_markup(),
-                parse_mode="Markdown",
-            )
-        except:
-            pass
+        notification_service.send_message(
+            chat_id=chat_id,
+            text=message,
+            reply_markup=builder.as_markup(),
+            parse_mode="Markdown",
+        )
 
     async def _send_booking_reminder(
         self,
@@ -241,38 +343,15 @@ class EventChecker:
             "Пожалуйста, подумайте о продлении."
         )
 
-        from app.bot import get_bot
-
         print(f"---> send noti for user ({chat_id}) and message {message}")
 
-        try:
-            await get_bot().send_message(
-                chat_id=chat_id,
-                text=message,
-                reply_markup=builder.as_markup(),
-                parse_mode="Markdown",
-            )
-        except:
-            pass
-
-    async def _process_start_booking_notification_for_websocket(self, session):
-        start_bookings = await self._get_bookings(
-            session,
+        notification_service.send_message(
+            chat_id=chat_id,
+            text=message,
+            reply_markup=builder.as_markup(),
+            parse_mode="Markdown",
         )
 
-        start_bookings = list(
-            filter(
-                lambda b: b.time_start <= datetime.now(self.tz) + timedelta(hours=3)
-                and b.notification_for_fronted_about_start == False,
-                start_bookings,
-            )
-        )
-
-        for booking in start_bookings:
-            await self._notify_booking_start(booking)
-            booking.notification_for_fronted_about_start = True
-            await session.commit()
-
     async def _notify_booking_start(self, booking: Booking):
         print(
             f"---> send noti about start for table ({booking.table_id}) and event `booking_canceled`"
@@ -300,3 +379,6 @@ class EventChecker:
                 "time_end": str(booking.time_end),
             },
         ))
+
+
+event_checker = EventChecker()
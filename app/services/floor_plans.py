@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from app.config import (
+    SVG_CACHE_DIR,
+    SVG_CACHE_MAX_BYTES,
+    SVG_MAX_BYTES,
+    SVG_MAX_ELEMENTS,
+    SVG_PARSE_WORKERS,
+)
+from app.infra.s3.storage import Storage
+from app.utils.parse_svg import TableShape, parse_floor_plan
+
+
+def svg_digest(svg: bytes) -> str:
+    return hashlib.sha256(svg).hexdigest()
+
+
+class FloorPlanCache:
+    """Floor plan SVGs on local disk, named by the SHA-256 of their bytes.
+
+    A file never changes once written, so a hit needs neither S3 nor the
+    database. Misses are filled from the `locations` bucket, once per
+    digest even when many requests miss together. A replaced plan is
+    dropped with `discard()`, and past `max_bytes` the oldest files go.
+    """
+
+    def __init__(self, directory: Path = SVG_CACHE_DIR, max_bytes: int = SVG_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.storage = Storage("locations")
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    def path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.svg"
+
+    async def put(self, svg: bytes) -> str:
+        digest = svg_digest(svg)
+        if not self.path(digest).exists():
+            await asyncio.to_thread(self._write, digest, svg)
+        return digest
+
+    async def get(self, location_id: str, digest: Optional[str]) -> Optional[Path]:
+        """The file of the location's plan with `digest`, or of its current
+        plan in S3 when the digest is not known yet."""
+        if digest is not None and self.path(digest).exists():
+            return self.path(digest)
+
+        async with self.locks.setdefault(location_id, asyncio.Lock()):
+            if digest is not None and self.path(digest).exists():
+                return self.path(digest)
+
+            svg = await self.storage.read_file(f"{location_id}.svg")
+            if not svg:
+                return None
+
+            # The bucket holds the latest plan only, an older digest cannot
+            # be served any more.
+            stored = svg_digest(svg)
+            if digest is not None and stored != digest:
+                return None
+
+            await asyncio.to_thread(self._write, stored, svg)
+            return self.path(stored)
+
+    def _write(self, digest: str, svg: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, a reader never sees half a file.
+        temporary = self.directory / f".{digest}.{uuid4().hex}.tmp"
+        temporary.write_bytes(svg)
+        os.replace(temporary, self.path(digest))
+        self._trim(keep=digest)
+
+    async def discard(self, digest: str):
+        await asyncio.to_thread(self.path(digest).unlink, missing_ok=True)
+
+    def _trim(self, keep: str):
+        files = []
+        for path in self.directory.glob("*.svg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path.stem == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class FloorPlanParser:
+    """Parses uploaded floor plans in worker processes.
+
+    Parsing is CPU-bound, in a process it neither holds the GIL nor the
+    event loop. `spawn` keeps the children clear of the parent's threads and
+    connections. A spawned child imports the app's entry point before its
+    first task, so `start()` launches every worker at startup and no upload
+    waits for that.
+    """
+
+    def __init__(self, workers: int = SVG_PARSE_WORKERS):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        # No worker is idle yet, so each of these launches one.
+        await asyncio.gather(
+            *(
+                asyncio.wrap_future(self.executor.submit(os.getpid))
+                for _ in range(self.workers)
+            )
+        )
+
+    async def parse(self, svg: bytes) -> List[TableShape]:
+        if self.executor is None:
+            await self.start()
+
+        future = self.executor.submit(
+            parse_floor_plan, svg, SVG_MAX_BYTES, SVG_MAX_ELEMENTS
+        )
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+floor_plans = FloorPlanCache()
+floor_plan_parser = FloorPlanParser()
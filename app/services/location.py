@@ -1,12 +1,17 @@
 from datetime import datetime
 from os import getenv
+from typing import Optional, Tuple
 
 from app.exceptions import ServiceException
 from app.infra.database.models import Location
+from app.infra.database.session import after_commit
 from app.infra.repository.location import LocationRepository
+from app.infra.repository.profiles import LOCATION_SUMMARY
 from app.infra.repository.table import TableRepository
 from app.infra.s3.storage import Storage
-from app.utils.parse_svg import extract_table_ids
+from app.services.availability import availability_index
+from app.services.floor_plans import floor_plan_parser, floor_plans
+from app.utils.parse_svg import SvgError
 
 DEFAULT_TABLE_PERSONS = int(getenv('DEFAULT_TABLE_PERSONS', 1))
 
@@ -35,37 +40,58 @@ class LocationService:
             return
 
         location = await self.repo.get(location_id)
+        replaced = location.svg_hash
 
-        tables = extract_table_ids(svg)
+        try:
+            tables = await floor_plan_parser.parse(svg)
+        except SvgError as e:
+            raise ServiceException(status_code=400, detail=str(e))
 
         if not tables:
             raise ServiceException(
                 status_code=400, detail='Файл не соответствует требованиям, мы не распознали в нем столы и комнаты')
 
-        for table in await self.tables.find(location_id=location.id):
-            await self.tables.delete(id=table.id)
+        await self.tables.sync_location_tables(
+            location.id,
+            [
+                {
+                    "table_name": table.name,
+                    "max_people_amount": (
+                        DEFAULT_TABLE_PERSONS if table.name.startswith("table") else 5
+                    ),
+                    "x": table.x,
+                    "y": table.y,
+                    "width": table.width,
+                    "height": table.height,
+                }
+                for table in tables
+            ],
+        )
 
-        for table in tables:
-            max_people_amount = (
-                DEFAULT_TABLE_PERSONS if table.startswith("table") else 5
-            )
+        after_commit(availability_index.invalidate, location.id)
 
-            t = await self.tables.create(
-                table_name=table,
-                location_id=location.id,
-                max_people_amount=max_people_amount,
-            )
+        # Cached here right away, other workers fill theirs from S3.
+        digest = await floor_plans.put(svg)
 
         storage = Storage("locations")
 
-        filename = f"{location_id}.svg"
-        await storage.delete_file(filename)
-        await storage.upload_file(svg, filename)
+        # put_object replaces the old plan in one request. Other workers fill
+        # their cache from there, the hash is saved only once it is in.
+        if not await storage.upload_file(svg, f"{location_id}.svg"):
+            raise ServiceException(
+                status_code=503, detail="Не удалось сохранить схему зала, попробуйте ещё раз.")
+
+        updated = await self.repo.update(location.id, svg_hash=digest)
 
-        return location
+        # Nothing links to the replaced plan any more, unless another
+        # location has the very same file.
+        if replaced and replaced != digest and not await self.repo.find_one(svg_hash=replaced):
+            await floor_plans.discard(replaced)
+
+        return updated
 
     async def get(self, location_id: str, admin_id: str) -> Location:
-        location = await self.repo.get(location_id)
+        location = await self.repo.get(location_id, options=LOCATION_SUMMARY)
 
         if not location:
             raise ServiceException(
@@ -81,8 +107,14 @@ class LocationService:
         location = await self.get(location_id=location_id, admin_id=admin_id)
 
         await self.repo.delete(location.id)
+        after_commit(availability_index.invalidate, location.id)
+
+    async def get_location_tables(
+        self, location_id: str, area: Optional[Tuple[float, float, float, float]] = None
+    ):
+        if area is not None:
+            return await self.tables.find_in_area(location_id, *area)
 
-    async def get_location_tables(self, location_id: str):
         tables = await self.tables.find(location_id=location_id)
 
         return tables
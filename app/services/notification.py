@@ -1 +1,262 @@
-class NotificationService: ...
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+
+# Telegram allows about 30 messages per second per bot and one message per
+# second to the same chat.
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+
+WORKERS = 8
+QUEUE_SIZE = 10_000
+MAX_ATTEMPTS = 5
+LATENCY_WINDOW = 1_000
+# Per-chat buckets kept before the idle ones are forgotten.
+MAX_CHATS = 10_000
+# How soon a delivery whose turn came is offered to a full queue again.
+REQUEUE_DELAY = 0.1
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `capacity` at once.
+
+    `reserve()` takes a token right away, going into debt if there is none,
+    and returns how long the caller has to wait before using it. Waiters are
+    served in the order they reserved.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        self.refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Delivery:
+    __slots__ = ("chat_id", "kwargs", "enqueued", "attempts", "reserved")
+
+    def __init__(self, chat_id: int, kwargs: dict, enqueued: float):
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.enqueued = enqueued
+        self.attempts = 0
+        # Holds a per-chat token already, taken when it was deferred.
+        self.reserved = False
+
+
+async def send_with_bot(chat_id: int, **kwargs):
+    from app.bot import get_bot
+
+    await get_bot().send_message(chat_id=chat_id, **kwargs)
+
+
+class NotificationService:
+    """Outbound Telegram messages.
+
+    `send_message()` only puts the message on a bounded queue. A pool of
+    workers delivers it within the global and per-chat rate limits, waits out
+    `RetryAfter` and retries network errors.
+
+    A message to a chat that is not ready yet goes to that chat's line in
+    `deferred` and comes back to the queue on its turn, the worker moves on
+    to other chats meanwhile.
+    """
+
+    def __init__(
+        self,
+        send: Callable[..., Awaitable] = send_with_bot,
+        workers: int = WORKERS,
+        queue_size: int = QUEUE_SIZE,
+        global_rate: float = GLOBAL_RATE,
+        chat_rate: float = CHAT_RATE,
+    ):
+        self.send = send
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+
+        self.bucket: Optional[TokenBucket] = None
+        self.chats: Dict[int, TokenBucket] = {}
+        self.deferred: Dict[int, Deque[Delivery]] = {}
+        self.paused_until = 0.0
+        self.tasks: List[asyncio.Task] = []
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        # No burst: Telegram counts over a sliding window, so messages are
+        # spread evenly instead.
+        self.bucket = TokenBucket(self.global_rate, 1, loop.time())
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5):
+        """Gives the queue `timeout` seconds to drain, then stops the workers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Notification queue stopped with {self.queue.qsize()} messages left")
+
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def send_message(self, chat_id: int, **kwargs) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            self.queue.put_nowait(Delivery(chat_id, kwargs, loop.time()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"Notification queue is full, message for ({chat_id}) dropped")
+            return False
+        return True
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return dict(
+            queue_depth=self.queue.qsize(),
+            deferred=sum(len(waiting) for waiting in self.deferred.values()),
+            sent=self.sent,
+            failed=self.failed,
+            retried=self.retried,
+            dropped=self.dropped,
+            latency_avg=sum(latencies) / len(latencies) if latencies else 0.0,
+            latency_p95=latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            latency_max=latencies[-1] if latencies else 0.0,
+        )
+
+    def _chat(self, chat_id: int, now: float) -> TokenBucket:
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            if len(self.chats) >= MAX_CHATS:
+                self._forget_idle_chats(now)
+            chat = self.chats[chat_id] = TokenBucket(self.chat_rate, 1, now)
+        return chat
+
+    def _defer(self, delivery: Delivery) -> bool:
+        """Puts the delivery in its chat's line unless the chat is ready.
+
+        A deferred delivery stays unfinished in the queue's count until it
+        is sent, so `stop()` waits for it as well.
+        """
+        if delivery.reserved:
+            delivery.reserved = False
+            return False
+
+        waiting = self.deferred.get(delivery.chat_id)
+        if waiting is not None:
+            waiting.append(delivery)
+            return True
+
+        loop = asyncio.get_running_loop()
+        delay = self._chat(delivery.chat_id, loop.time()).reserve(loop.time())
+        if delay <= 0:
+            return False
+
+        self.deferred[delivery.chat_id] = deque([delivery])
+        loop.call_later(delay, self._release, delivery.chat_id)
+        return True
+
+    def _release(self, chat_id: int):
+        """Hands the first delivery of a chat's line back to the workers."""
+        loop = asyncio.get_running_loop()
+        waiting = self.deferred[chat_id]
+
+        delivery = waiting[0]
+        delivery.reserved = True
+        try:
+            self.queue.put_nowait(delivery)
+        except asyncio.QueueFull:
+            delivery.reserved = False
+            loop.call_later(REQUEUE_DELAY, self._release, chat_id)
+            return
+        waiting.popleft()
+        # Put back above, its first pass through the queue is over.
+        self.queue.task_done()
+
+        if not waiting:
+            del self.deferred[chat_id]
+            return
+        delay = self._chat(chat_id, loop.time()).reserve(loop.time())
+        loop.call_later(max(delay, 0), self._release, chat_id)
+
+    async def _wait_turn(self):
+        loop = asyncio.get_running_loop()
+
+        # Flood control and the bot-wide rate hold everyone, they are waited
+        # out right here.
+        delay = self.paused_until - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        delay = self.bucket.reserve(loop.time())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _forget_idle_chats(self, now: float):
+        for chat_id, chat in list(self.chats.items()):
+            chat.refill(now)
+            if chat.tokens >= chat.capacity and chat_id not in self.deferred:
+                del self.chats[chat_id]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            delivery: Delivery = await self.queue.get()
+            if self._defer(delivery):
+                continue
+
+            try:
+                await self._wait_turn()
+                delivery.attempts += 1
+                await self.send(chat_id=delivery.chat_id, **delivery.kwargs)
+            except TelegramRetryAfter as e:
+                # Flood control applies to the whole bot, so everyone waits.
+                self.paused_until = max(self.paused_until, loop.time() + e.retry_after)
+                self._retry(delivery, e)
+            except TelegramNetworkError as e:
+                await asyncio.sleep(min(2 ** delivery.attempts, 30))
+                self._retry(delivery, e)
+            except Exception as e:
+                self.failed += 1
+                print(f"---> message for ({delivery.chat_id}) not delivered: {e}")
+            else:
+                self.sent += 1
+                self.latencies.append(loop.time() - delivery.enqueued)
+            finally:
+                self.queue.task_done()
+
+    def _retry(self, delivery: Delivery, error: Exception):
+        if delivery.attempts >= MAX_ATTEMPTS:
+            self.failed += 1
+            print(f"---> message for ({delivery.chat_id}) not delivered: {error}")
+            return
+
+        try:
+            self.queue.put_nowait(delivery)
+            self.retried += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+notification_service = NotificationService()
@@ -0,0 +1,83 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Optional
+
+from app.config import PASSWORD_HASH_WORKERS
+from app.utils.security import hash_password, verify_password
+
+QUEUE_TIME_WINDOW = 1_000
+
+
+class PasswordHasher:
+    """pbkdf2 hashing and verification off the event loop.
+
+    Jobs run on a small thread pool: passlib derives the key through
+    hashlib, which releases the GIL meanwhile, so the loop keeps serving
+    other requests. At most `workers` jobs run at once, the others wait
+    their turn and the time they waited is kept for `stats()`.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS):
+        self.workers = workers
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+        self.waiting = 0
+        self.hashed = 0
+        self.verified = 0
+        self.queue_times: Deque[float] = deque(maxlen=QUEUE_TIME_WINDOW)
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(hash_password, password)
+        self.hashed += 1
+        return hashed
+
+    async def verify(self, password: str, hash: str) -> bool:
+        verified = await self._run(verify_password, password, hash)
+        self.verified += 1
+        return verified
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self) -> dict:
+        queue_times = sorted(self.queue_times)
+        return dict(
+            workers=self.workers,
+            waiting=self.waiting,
+            hashed=self.hashed,
+            verified=self.verified,
+            queue_time_avg=sum(queue_times) / len(queue_times) if queue_times else 0.0,
+            queue_time_p95=queue_times[int(len(queue_times) * 0.95)] if queue_times else 0.0,
+            queue_time_max=queue_times[-1] if queue_times else 0.0,
+        )
+
+    async def _run(self, job: Callable, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="password-hasher"
+            )
+            self.semaphore = asyncio.Semaphore(self.workers)
+
+        loop = asyncio.get_running_loop()
+        queued = loop.time()
+
+        # The pool never has more jobs than threads, so the wait for the
+        # semaphore is the whole queue time.
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        try:
+            self.queue_times.append(loop.time() - queued)
+            return await loop.run_in_executor(self.executor, job, *args)
+        finally:
+            self.semaphore.release()
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+from sqlalchemy.orm import object_session
+
+from app.config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+
+
+class Principal:
+    __slots__ = ("claims", "row", "expires")
+
+    def __init__(self, claims: Optional[dict], row: Any, expires: float):
+        self.claims = claims
+        self.row = row
+        self.expires = expires
+
+
+class PrincipalCache:
+    """Bounded LRU of authenticated users and admins with a TTL.
+
+    Keyed by the bearer token, or by the Telegram id for the bot. Entries
+    keep the decoded claims and the `User`/`Admin` row, so a hot request
+    authenticates without a query. Rows are read-only here: their
+    relationships are lazy="raise" and they outlive their session.
+
+    The cache is per process, a profile change made by another worker is
+    seen once the entry expires.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, Principal]" = OrderedDict()
+        # (model name, row id) -> keys holding that row
+        self.owners: Dict[Tuple[str, Any], Set[Hashable]] = {}
+
+    def get(self, key: Hashable) -> Optional[Principal]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expires <= time.monotonic():
+            self._pop(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, row: Any, claims: Optional[dict] = None):
+        if self.size <= 0:
+            return
+
+        expires = time.monotonic() + self.ttl
+        # A token must not outlive its own expiration in the cache.
+        if claims and "exp" in claims:
+            expires = min(expires, time.monotonic() + claims["exp"] - time.time())
+
+        # Out of the request session, or its rollback would expire the row
+        # under every later request.
+        session = object_session(row)
+        if session is not None:
+            session.expunge(row)
+
+        self._pop(key)
+        self.entries[key] = Principal(claims, row, expires)
+        self.owners.setdefault(self._owner(row), set()).add(key)
+
+        while len(self.entries) > self.size:
+            self._pop(next(iter(self.entries)))
+
+    def invalidate(self, model: type, id: Any):
+        """Drops every entry of a row, call it after changing the row."""
+        for key in self.owners.pop((model.__name__, id), ()):
+            self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+        self.owners.clear()
+
+    def _pop(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+
+        owner = self._owner(entry.row)
+        keys = self.owners.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.owners[owner]
+
+    @staticmethod
+    def _owner(row: Any) -> Tuple[str, Any]:
+        return type(row).__name__, row.id
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
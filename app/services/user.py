@@ -1,4 +1,6 @@
+from app.infra.database.models import User
 from app.infra.repository.user import UserRepository
+from app.services.principals import principal_cache
 
 
 class UserService:
@@ -11,6 +13,11 @@ class UserService:
     async def get_by_id(self, user_id: int):
         return await self.repo.get(user_id)
 
+    async def update(self, user_id: int, **updates):
+        user = await self.repo.update(user_id, **updates)
+        principal_cache.invalidate(User, user_id)
+        return user
+
     async def get_or_create(self, user_id: int, first_name: str, username: str):
         user = await self.get_by_id(user_id)
         if not user:
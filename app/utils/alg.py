@@ -1,132 +1,153 @@
 import asyncio
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram import types
-from app.config import TIMEZONE
-from app.services.event_checker import BookingCallbackData
+from app.services.availability import availability_index
+from app.services.event_checker import BookingCallbackData, event_checker
+from app.services.notification import notification_service
+from app.utils.occupancy import OccupancyMatrix, normalize
 from app.utils.websockets import notify_users
 from app.utils.words import get_russion_table_name
 
 
-def max_zeros_between_ones(arr):
-    indices_of_ones = [i for i, x in enumerate(arr) if x == 1]
-    if len(indices_of_ones) < 2:
-        return 0
-    max_zeros = 0
-    for i in range(1, len(indices_of_ones)):
-        zeros_between = indices_of_ones[i] - indices_of_ones[i - 1] - 1
-        max_zeros = max(max_zeros, zeros_between)
-    return max_zeros
-
-
-def get_max_zero_block_start(arr, zeros):
-    current_zeros = 0
-    start_index = None
-
-    for i, x in enumerate(arr):
-        if x == 0:
-            if current_zeros == 0:
-                start_index = i
-            current_zeros += 1
-        else:
-            current_zeros = 0
-
-        if current_zeros == zeros:
-            return start_index
-
-    return 0
-
+def longest_free_run(bits: int, slots: int) -> Tuple[int, int]:
+    """Length and start of the longest run of free slots in a timeline row."""
+    best_length, best_start = 0, 0
+    length = 0
+    for i in range(slots):
+        if (bits >> i) & 1:
+            length = 0
+            continue
+        length += 1
+        if length > best_length:
+            best_length, best_start = length, i - length + 1
+    return best_length, best_start
+
+
+class FreeRunIndex:
+    """Longest free run of every single-seat table, bucketed by its length.
+
+    A request for `n` hours only looks at tables whose longest run is at
+    least `n`, shortest runs first, so long gaps are kept for long requests.
+    """
+
+    def __init__(self, occupancy: OccupancyMatrix):
+        self.occupancy = occupancy
+        self.runs: Dict[int, Tuple[int, int]] = {}
+        self.buckets: List[Set[int]] = [set() for _ in range(occupancy.slots + 1)]
+
+        for row, max_people in enumerate(occupancy.max_people):
+            if max_people == 1:
+                self._index(row)
+
+    def _index(self, row: int):
+        run = longest_free_run(self.occupancy.rows[row], self.occupancy.slots)
+        self.runs[row] = run
+        self.buckets[run[0]].add(row)
+
+    def find(self, first: int, last: int) -> Optional[int]:
+        for length in range(last - first, len(self.buckets)):
+            for row in self.buckets[length]:
+                if self.occupancy.is_free(row, first, last):
+                    return row
+
+    def assign(self, row: int, first: int, last: int):
+        self.buckets[self.runs[row][0]].discard(row)
+        self.occupancy.rows[row] |= self.occupancy.mask(first, last)
+        self._index(row)
+
+
+def match_queue(occupancy: OccupancyMatrix, queue_entries, now: datetime, user_id):
+    """Assign free single-seat tables to queue entries in one pass over the queue."""
+    index = FreeRunIndex(occupancy)
+    served_users = set()
+
+    matches = []
+    for queue_entry in queue_entries:
+        if queue_entry.user_id == user_id or queue_entry.user_id in served_users:
+            continue
+
+        time_start = queue_entry.date or now + timedelta(hours=1)
+        time_end = time_start + timedelta(hours=queue_entry.hours)
+
+        first, last = occupancy.slot_range(time_start, time_end)
+        if last - first != queue_entry.hours:
+            continue
+
+        row = index.find(first, last)
+        if row is None:
+            continue
+
+        index.assign(row, first, last)
+        served_users.add(queue_entry.user_id)
+        matches.append(
+            dict(
+                queue_id=queue_entry.id,
+                user_id=queue_entry.user_id,
+                table_id=occupancy.table_ids[row],
+                table_name=occupancy.table_names[row],
+                time_start=normalize(time_start),
+                time_end=normalize(time_end),
+                comment=queue_entry.comment,
+            )
+        )
+    return matches
 
-async def check_queue_entry(booking_service, queue_service, queue_entry, booking, now, booking_time_start, timelines, user_id):
-    if queue_entry.user.id == user_id:
-        return False
 
-    checker_start = queue_entry.date
-    if checker_start is None:
-        checker_start = now + timedelta(hours=1)
+async def notify_queue_user(booking: dict):
+    message = (
+        "✅ Вы встали в очередь и мы забронировали вам место:\n"
+        f"• Место: {get_russion_table_name(booking['table_name'])}\n"
+    )
+    builder = InlineKeyboardBuilder()
+    callback_data = BookingCallbackData(
+        action="start",
+        booking_id=booking["id"],
+    ).pack()
+
+    builder.add(
+        types.InlineKeyboardButton(
+            text="❌ Отменить бронь", callback_data=callback_data
+        )
+    )
+    notification_service.send_message(
+        chat_id=booking["user_id"],
+        text=message,
+        reply_markup=builder.as_markup()
+    )
 
-    end_hours = checker_start.hour + queue_entry.hours
-    if queue_entry.date.date() != booking_time_start.date():
-        return False
 
-    max_hours = max(
-        max_zeros_between_ones(timeline[checker_start.hour:end_hours]) if sum(timeline) != 0 else 24 
-        for timeline in timelines
+async def handle_additional_operations(booking, queue_service, tables_service, booking_service, now, user_id):
+    location_id = booking.table.location_id
+    occupancy = await tables_service.repo.get_occupancy(
+        location_id, booking.time_start.date(), days=2
+    )
+    queue_entries = await queue_service.get_location_queues_by_day(
+        location_id, booking.time_start.date()
     )
 
-    if queue_entry.hours > max_hours:
-        return False
-    
-    start_hour = get_max_zero_block_start(timelines[checker_start.hour:end_hours], max_hours)
-    start_day, start_hour = divmod(start_hour + checker_start.hour, 24)
-    start_date = checker_start.replace(day=checker_start.day + start_day, hour=start_hour)
-    time_end = start_date + timedelta(hours=queue_entry.hours)
-
-    try:
-        new_booking = await booking_service.create_booking(
-            table_id=booking.table.id,
-            time_start=start_date.replace(tzinfo=None),
-            time_end=time_end.replace(tzinfo=None),
-            features=[],
-            comment=queue_entry.comment,
-            people_amount=1,
-            location_id=booking.table.location_id,
-            table_name=booking.table.table_name,
-            user_id=queue_entry.user.id
+    matches = match_queue(occupancy, queue_entries, now, user_id)
+    created = await booking_service.repo.create_queue_bookings(location_id, matches)
+
+    for new_booking in created:
+        availability_index.add_slot(
+            location_id,
+            new_booking["table_id"],
+            new_booking["id"],
+            new_booking["time_start"],
+            new_booking["time_end"],
         )
         asyncio.create_task(notify_users(
-            new_booking.table.location_id,
+            location_id,
             {
                 "event": "booking_created",
-                "table_id": new_booking.table.table_name,
-                "time_start": str(new_booking.time_start),
-                "time_end": str(new_booking.time_end),
+                "table_id": new_booking["table_name"],
+                "time_start": str(new_booking["time_start"]),
+                "time_end": str(new_booking["time_end"]),
             },
         ))
-        await queue_service.queue.delete(queue_entry.id)
-
-        from app.bot import get_bot
-
-        message = (
-            "✅ Вы встали в очередь и мы забронировали вам место:\n"
-            f"• Место: {get_russion_table_name(booking.table.table_name)}\n"
-        )
-        builder = InlineKeyboardBuilder()
-        callback_data = BookingCallbackData(
-            action="start",
-            booking_id=booking.id,
-        ).pack()
-        
-        builder.add(
-            types.InlineKeyboardButton(
-                text="❌ Отменить бронь", callback_data=callback_data
-            )
-        )
-        try:
-            await get_bot().send_message(
-                chat_id=queue_entry.user.id,
-                text=message,
-                reply_markup=builder.as_markup()
-            )
-        except:
-            pass
-        return True
-    except:
-        return False
-
-async def handle_additional_operations(booking, queue_service, tables_service, booking_service, now, user_id):
-    booking_time_start = booking.time_start
-    location_id = booking.table.location.id
-    timelines = await tables_service.repo.get_bookings_timelines(
-        location_id, booking.time_start.date(), is_two_days=True
-    )
+        await notify_queue_user(new_booking)
 
-    for queue_entry in await queue_service.get_location_queues_by_day(
-        booking.table.location.id, booking.time_start.date()
-    ):
-    
-        result = await check_queue_entry(booking_service, queue_service, queue_entry, booking, now, booking_time_start, timelines, user_id)
-        if result:
-            timelines = await tables_service.repo.get_bookings_timelines(
-                location_id, booking.time_start.date(), is_two_days=True
-            )
\ No newline at end of file
+    if created:
+        event_checker.wake()
@@ -0,0 +1,136 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from app.config import ENGINE
+
+# SQLite stores the wall-clock time of an aware datetime and drops its offset,
+# so values read back are naive and only compare to times stripped the same way.
+CONVERT_TO_UTC = "sqlite" not in ENGINE
+
+
+def normalize(dt: datetime) -> datetime:
+    """Bring aware and naive datetimes from the database to naive UTC.
+
+    On SQLite the offset is dropped without conversion instead.
+    """
+    if dt.tzinfo is not None:
+        if CONVERT_TO_UTC:
+            dt = dt.astimezone(timezone.utc)
+        dt = dt.replace(tzinfo=None)
+    return dt
+
+
+def as_stored(dt: datetime) -> datetime:
+    """Undo `normalize`: the datetime as the database driver returns it."""
+    if CONVERT_TO_UTC:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Half-open `[start, end)` range of a calendar day.
+
+    Filtering on the range instead of `CAST(column AS DATE)` lets the
+    database use an index on the column.
+    """
+    if isinstance(day, datetime):
+        day = day.date()
+    start = datetime.combine(day, time())
+    return start, start + timedelta(days=1)
+
+
+def hour_number(dt: datetime, ceil: bool = False) -> int:
+    # Hour arithmetic on the ordinal is several times cheaper than
+    # datetime subtraction, and slots are always one hour long.
+    hour = dt.toordinal() * 24 + dt.hour
+    if ceil and (dt.minute or dt.second or dt.microsecond):
+        hour += 1
+    return hour
+
+
+class OccupancyMatrix:
+    """Tables × hourly slots occupancy of a location.
+
+    Every row is a bit-packed int: bit `i` is set when the table is booked
+    during slot `i`, so a booking is filled with one shift-and-or and a range
+    check is a single AND regardless of its length.
+    """
+
+    __slots__ = ("start", "origin", "slots", "table_ids", "table_names", "max_people", "rows", "index")
+
+    def __init__(self, start: datetime, slots: int):
+        self.start = normalize(start).replace(minute=0, second=0, microsecond=0)
+        self.origin = hour_number(self.start)
+        self.slots = slots
+
+        self.table_ids: List[str] = []
+        self.table_names: List[str] = []
+        self.max_people: List[int] = []
+        self.rows: List[int] = []
+        self.index: Dict[str, int] = {}
+
+    @classmethod
+    def from_rows(cls, start: datetime, slots: int, rows: Iterable[Tuple]):
+        """Build the matrix from `(table_id, table_name, max_people_amount,
+        time_start, time_end)` rows, with NULL times for tables without bookings."""
+        matrix = cls(start, slots)
+        index, filled, origin = matrix.index, matrix.rows, matrix.origin
+
+        # slot_range() and mask() inlined: this loop runs once per booking.
+        for table_id, table_name, max_people, time_start, time_end in rows:
+            row = index.get(table_id)
+            if row is None:
+                row = matrix.add_table(table_id, table_name, max_people)
+            if time_start is None:
+                continue
+
+            if time_start.tzinfo is not None:
+                time_start, time_end = normalize(time_start), normalize(time_end)
+
+            first = time_start.toordinal() * 24 + time_start.hour - origin
+            last = time_end.toordinal() * 24 + time_end.hour - origin
+            if time_end.minute or time_end.second or time_end.microsecond:
+                last += 1
+
+            if first < 0:
+                first = 0
+            if last > slots:
+                last = slots
+            if last > first:
+                filled[row] |= ((1 << (last - first)) - 1) << first
+        return matrix
+
+    def add_table(self, table_id: str, table_name: str, max_people: int = 1) -> int:
+        self.index[table_id] = len(self.rows)
+        self.table_ids.append(table_id)
+        self.table_names.append(table_name)
+        self.max_people.append(max_people)
+        self.rows.append(0)
+        return self.index[table_id]
+
+    def slot_range(self, time_start: datetime, time_end: datetime) -> Tuple[int, int]:
+        if time_start.tzinfo is not None:
+            time_start, time_end = normalize(time_start), normalize(time_end)
+
+        first = hour_number(time_start) - self.origin
+        last = hour_number(time_end, ceil=True) - self.origin
+        return max(first, 0), min(last, self.slots)
+
+    @staticmethod
+    def mask(first: int, last: int) -> int:
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def fill(self, table_id: str, time_start: datetime, time_end: datetime):
+        self.rows[self.index[table_id]] |= self.mask(*self.slot_range(time_start, time_end))
+
+    def is_free(self, row: int, first: int, last: int) -> bool:
+        return not self.rows[row] & self.mask(first, last)
+
+    def timeline(self, row: int) -> List[int]:
+        bits = self.rows[row]
+        return [(bits >> i) & 1 for i in range(self.slots)]
+
+    def timelines(self) -> List[List[int]]:
+        return [self.timeline(row) for row in range(len(self.rows))]
@@ -0,0 +1,21 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Tuple
+
+# Position after a row in a list ordered by (time_start, id).
+Cursor = Tuple[datetime, str]
+
+
+def encode_cursor(time_start: datetime, id: str) -> str:
+    data = json.dumps([time_start.isoformat(), id]).encode()
+    return urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Raises ValueError for anything `encode_cursor` did not make."""
+    try:
+        time_start, id = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(time_start), str(id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
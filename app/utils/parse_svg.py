@@ -1,24 +1,324 @@
+import math
+import re
 import xml.etree.ElementTree as ET
 from io import BytesIO
-from typing import List
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
+TABLE_PREFIXES = ("table", "room")
+
+# Content of these is drawn elsewhere, or not at all.
+NOT_RENDERED = {"defs", "symbol", "clipPath", "mask", "pattern", "marker", "metadata"}
+
+Matrix = Tuple[float, float, float, float, float, float]
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+PATH_TOKEN = re.compile(r"[MmZzLlHhVvCcSsQqTtAa]|" + NUMBER.pattern)
+
+
+class SvgError(ValueError):
+    """An SVG that is not accepted, the message is shown to the admin."""
+
+
+class TableShape(NamedTuple):
+    name: str
+    # Bounding box in the plan's user units, None without any geometry.
+    x: Optional[float] = None
+    y: Optional[float] = None
+    width: Optional[float] = None
+    height: Optional[float] = None
+
+
+class Box:
+    __slots__ = ("x0", "y0", "x1", "y1")
+
+    def __init__(self):
+        self.x0 = self.y0 = math.inf
+        self.x1 = self.y1 = -math.inf
+
+    def add(self, x: float, y: float):
+        self.x0, self.x1 = min(self.x0, x), max(self.x1, x)
+        self.y0, self.y1 = min(self.y0, y), max(self.y1, y)
+
+    def merge(self, other: "Box"):
+        if not other.empty:
+            self.add(other.x0, other.y0)
+            self.add(other.x1, other.y1)
+
+    @property
+    def empty(self) -> bool:
+        return self.x0 > self.x1
+
+
+def multiply(m: Matrix, n: Matrix) -> Matrix:
+    a, b, c, d, e, f = m
+    g, h, i, j, k, l = n
+    return (
+        a * g + c * h,
+        b * g + d * h,
+        a * i + c * j,
+        b * i + d * j,
+        a * k + c * l + e,
+        b * k + d * l + f,
+    )
+
+
+def parse_transform(value: Optional[str]) -> Matrix:
+    matrix = IDENTITY
+    for name, args in TRANSFORM.findall(value or ""):
+        v = [float(n) for n in NUMBER.findall(args)]
+        if name == "matrix" and len(v) == 6:
+            step = tuple(v)
+        elif name == "translate" and v:
+            step = (1, 0, 0, 1, v[0], v[1] if len(v) > 1 else 0)
+        elif name == "scale" and v:
+            step = (v[0], 0, 0, v[1] if len(v) > 1 else v[0], 0, 0)
+        elif name == "rotate" and v:
+            cos, sin = math.cos(math.radians(v[0])), math.sin(math.radians(v[0]))
+            step = (cos, sin, -sin, cos, 0, 0)
+            if len(v) == 3:
+                cx, cy = v[1], v[2]
+                step = multiply((1, 0, 0, 1, cx, cy), multiply(step, (1, 0, 0, 1, -cx, -cy)))
+        elif name == "skewX" and v:
+            step = (1, 0, math.tan(math.radians(v[0])), 1, 0, 0)
+        elif name == "skewY" and v:
+            step = (1, math.tan(math.radians(v[0])), 0, 1, 0, 0)
+        else:
+            continue
+        matrix = multiply(matrix, step)
+    return matrix
+
+
+def length(value: Optional[str]) -> float:
+    # Units are ignored, a plan is drawn in user units anyway.
+    match = NUMBER.match(value.strip()) if value else None
+    return float(match.group()) if match else 0.0
+
+
+def cubic_extrema(p0: float, p1: float, p2: float, p3: float) -> Iterable[float]:
+    """Parameters in (0, 1) where one coordinate of a cubic Bézier turns."""
+    a = -p0 + 3 * p1 - 3 * p2 + p3
+    b = 2 * (p0 - 2 * p1 + p2)
+    c = p1 - p0
+    if abs(a) < 1e-12:
+        roots = [-c / b] if abs(b) > 1e-12 else []
+    else:
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            return ()
+        root = math.sqrt(discriminant)
+        roots = [(-b + root) / (2 * a), (-b - root) / (2 * a)]
+    return [t for t in roots if 0 < t < 1]
+
+
+def cubic_at(t: float, p0: float, p1: float, p2: float, p3: float) -> float:
+    s = 1 - t
+    return s * s * s * p0 + 3 * s * s * t * p1 + 3 * s * t * t * p2 + t * t * t * p3
+
+
+def path_points(d: str) -> Iterable[Tuple[float, float]]:
+    """Points whose hull holds the path: vertices and curve extrema. Arcs
+    are covered by their end points grown by the radii."""
+    tokens = PATH_TOKEN.findall(d)
+    i, command = 0, None
+    x = y = start_x = start_y = 0.0
+    # Last control point, for the smooth curve commands.
+    control: Optional[Tuple[float, float]] = None
+
+    def numbers(count: int) -> Optional[List[float]]:
+        nonlocal i
+        values = tokens[i:i + count]
+        if len(values) < count or any(v.isalpha() for v in values):
+            return None
+        i += count
+        return [float(v) for v in values]
+
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in "Zz":
+                x, y, control = start_x, start_y, None
+                yield x, y
+                continue
+        elif command is None:
+            break
+
+        relative = command.islower()
+        kind = command.upper()
+        ox, oy = (x, y) if relative else (0.0, 0.0)
+
+        if kind in "ML":
+            v = numbers(2)
+            if v is None:
+                break
+            x, y = ox + v[0], oy + v[1]
+            if kind == "M":
+                start_x, start_y = x, y
+                # Further pairs after a moveto are linetos.
+                command = "l" if relative else "L"
+            control = None
+            yield x, y
+        elif kind == "H":
+            v = numbers(1)
+            if v is None:
+                break
+            x, control = (x if relative else 0.0) + v[0], None
+            yield x, y
+        elif kind == "V":
+            v = numbers(1)
+            if v is None:
+                break
+            y, control = (y if relative else 0.0) + v[0], None
+            yield x, y
+        elif kind in "CS":
+            v = numbers(6 if kind == "C" else 4)
+            if v is None:
+                break
+            if kind == "C":
+                c1 = (ox + v[0], oy + v[1])
+                v = v[2:]
+            else:
+                c1 = (2 * x - control[0], 2 * y - control[1]) if control else (x, y)
+            c2, end = (ox + v[0], oy + v[1]), (ox + v[2], oy + v[3])
+            for axis in (0, 1):
+                p = ((x, y)[axis], c1[axis], c2[axis], end[axis])
+                for t in cubic_extrema(*p):
+                    point = [0.0, 0.0]
+                    point[axis] = cubic_at(t, *p)
+                    other = 1 - axis
+                    point[other] = cubic_at(t, (x, y)[other], c1[other], c2[other], end[other])
+                    yield point[0], point[1]
+            control, (x, y) = c2, end
+            yield x, y
+        elif kind in "QT":
+            v = numbers(4 if kind == "Q" else 2)
+            if v is None:
+                break
+            if kind == "Q":
+                c = (ox + v[0], oy + v[1])
+                v = v[2:]
+            else:
+                c = (2 * x - control[0], 2 * y - control[1]) if control else (x, y)
+            end = (ox + v[0], oy + v[1])
+            # The quadratic as a cubic, so the extrema code is shared.
+            c1 = (x + 2 / 3 * (c[0] - x), y + 2 / 3 * (c[1] - y))
+            c2 = (end[0] + 2 / 3 * (c[0] - end[0]), end[1] + 2 / 3 * (c[1] - end[1]))
+            for t in set(cubic_extrema(x, c1[0], c2[0], end[0])) | set(
+                cubic_extrema(y, c1[1], c2[1], end[1])
+            ):
+                yield (
+                    cubic_at(t, x, c1[0], c2[0], end[0]),
+                    cubic_at(t, y, c1[1], c2[1], end[1]),
+                )
+            control, (x, y) = c, end
+            yield x, y
+        elif kind == "A":
+            v = numbers(7)
+            if v is None:
+                break
+            rx, ry = abs(v[0]), abs(v[1])
+            points = ((x, y), (ox + v[5], oy + v[6]))
+            for px, py in points:
+                yield px - rx, py - ry
+                yield px + rx, py + ry
+            x, y = points[1]
+            control = None
+        else:
+            break
+
+
+def shape_points(tag: str, attrib: Dict[str, str]) -> Iterable[Tuple[float, float]]:
+    get = attrib.get
+    if tag in ("rect", "image", "use", "foreignObject"):
+        x, y = length(get("x")), length(get("y"))
+        width, height = length(get("width")), length(get("height"))
+        if width or height:
+            return ((x, y), (x + width, y), (x, y + height), (x + width, y + height))
+    elif tag in ("circle", "ellipse"):
+        cx, cy = length(get("cx")), length(get("cy"))
+        rx = length(get("r") if tag == "circle" else get("rx"))
+        ry = length(get("r") if tag == "circle" else get("ry"))
+        return ((cx - rx, cy - ry), (cx + rx, cy - ry), (cx - rx, cy + ry), (cx + rx, cy + ry))
+    elif tag == "line":
+        return ((length(get("x1")), length(get("y1"))), (length(get("x2")), length(get("y2"))))
+    elif tag in ("polyline", "polygon"):
+        v = [float(n) for n in NUMBER.findall(get("points", ""))]
+        return zip(v[0::2], v[1::2])
+    elif tag == "path":
+        return path_points(get("d", ""))
+    return ()
+
+
+def parse_floor_plan(svg: bytes, max_bytes: int, max_elements: int) -> List[TableShape]:
+    """Tables and rooms of a floor plan with their bounding boxes.
+
+    Streams the document with iterparse and drops every element once it
+    is measured, so memory stays flat however large the plan is. Meant to
+    run in a worker process: it is CPU-bound.
+    """
+    if len(svg) > max_bytes:
+        raise SvgError(f"Файл схемы больше {max_bytes // 2**20} МБ.")
+
+    order: List[str] = []
+    boxes: Dict[str, Box] = {}
+    # One frame per open element: the element, its matrix, the table box it
+    # draws into and whether it is rendered at all.
+    stack: List[Tuple[ET.Element, Matrix, Optional[Box], bool]] = []
+    elements = 0
 
-def extract_table_ids(svg_content: bytes) -> List[str]:
     try:
-        svg_file = BytesIO(initial_bytes=svg_content)
+        for event, element in ET.iterparse(BytesIO(svg), events=("start", "end")):
+            tag = element.tag.rpartition("}")[2]
+
+            if event == "start":
+                elements += 1
+                if elements > max_elements:
+                    raise SvgError(
+                        f"В схеме больше {max_elements} элементов, упростите файл."
+                    )
+
+                parent_matrix, box, rendered = (
+                    stack[-1][1:] if stack else (IDENTITY, None, True)
+                )
+                matrix = multiply(parent_matrix, parse_transform(element.get("transform")))
+                rendered = rendered and tag not in NOT_RENDERED
+
+                id_attr = element.get("id")
+                if rendered and id_attr and id_attr.startswith(TABLE_PREFIXES):
+                    if id_attr not in boxes:
+                        order.append(id_attr)
+                        boxes[id_attr] = Box()
+                    box = boxes[id_attr]
 
-        tree = ET.parse(svg_file)
-        root = tree.getroot()
+                stack.append((element, matrix, box, rendered))
+                continue
 
-        table_ids = []
+            _, matrix, box, rendered = stack.pop()
+            if box is not None and rendered:
+                a, b, c, d, e, f = matrix
+                for x, y in shape_points(tag, element.attrib):
+                    box.add(a * x + c * y + e, b * x + d * y + f)
 
-        for elem in root.iter():
-            id_attr: str = elem.attrib.get("id")
-            if id_attr and (id_attr.startswith("table") or id_attr.startswith("room")):
-                table_ids.append(id_attr)
+                # A room holds the tables drawn inside it.
+                if stack and stack[-1][2] is not None and stack[-1][2] is not box:
+                    stack[-1][2].merge(box)
 
-        print(table_ids)
+            element.clear()
+            # Detached from the parent too, or the empty shells pile up.
+            if stack and len(stack[-1][0]) and stack[-1][0][-1] is element:
+                del stack[-1][0][-1]
+    except ET.ParseError:
+        raise SvgError("Файл не является корректным SVG.")
 
-        return table_ids
-    except:
-        pass
+    shapes = []
+    for name in order:
+        box = boxes[name]
+        if box.empty:
+            shapes.append(TableShape(name))
+        else:
+            shapes.append(
+                TableShape(name, box.x0, box.y0, box.x1 - box.x0, box.y1 - box.y0)
+            )
+    return shapes
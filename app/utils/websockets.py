@@ -1,10 +1,307 @@
+import asyncio
+import json
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import msgpack
+from fastapi import WebSocket
+
 from app.config import active_connections
+from app.infra.events.bus import event_bus
+from app.utils.occupancy import as_stored
+
+# Flushes a client may fall behind by before it is disconnected.
+QUEUE_SIZE = 64
+# A single frame taking longer than this means the client is stuck.
+SEND_TIMEOUT = 10
+# Events of a location are collected for this long and sent together.
+COALESCE_WINDOW = 0.05
+# Recent events kept per location for clients that reconnect.
+REPLAY_SIZE = 512
+
+# Sequence numbers are per process. Every event carries the id of its
+# stream, a client resuming with the id of another one, e.g. after a restart
+# or on another worker, gets a snapshot instead.
+STREAM_ID = uuid.uuid4().hex[:8]
+
+
+class Connection:
+    """A subscribed socket with its own bounded outbound queue.
+
+    Broadcasts only enqueue, so a slow client delays nobody but itself, and
+    one that falls `QUEUE_SIZE` flushes behind is evicted. The writer task
+    exists only while there is something to send, so an idle connection is
+    just this object.
+    """
+
+    __slots__ = (
+        "location_id",
+        "user_id",
+        "websocket",
+        "encoding",
+        "batch",
+        "pending",
+        "task",
+        "alive",
+    )
+
+    def __init__(
+        self,
+        location_id: str,
+        user_id: int,
+        websocket: WebSocket,
+        encoding: str = "json",
+        batch: bool = False,
+    ):
+        self.location_id = location_id
+        self.user_id = user_id
+        self.websocket = websocket
+        # msgpack frames always carry a list of events.
+        self.encoding = encoding
+        self.batch = batch or encoding == "msgpack"
+        # Created on the first push; an empty deque alone is ~600 bytes.
+        self.pending: Optional[Deque[List[Union[str, bytes]]]] = None
+        self.task: Optional[asyncio.Task] = None
+        self.alive = True
+
+    def push(self, frames: List[Union[str, bytes]]):
+        if not self.alive:
+            return
+        if self.pending is None:
+            self.pending = deque()
+        elif len(self.pending) >= QUEUE_SIZE:
+            print(f"---> ws of user ({self.user_id}) fell behind, disconnecting")
+            self.close()
+            return
+
+        self.pending.append(frames)
+        if self.task is None:
+            self.task = asyncio.create_task(self._writer())
+
+    def close(self, code: Optional[int] = 1013):
+        """Unregisters the connection; `code` closes the socket as well."""
+        if not self.alive:
+            return
+        self.alive = False
+        self.pending = None
+        unregister(self)
+
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _writer(self):
+        try:
+            while self.pending:
+                for frame in self.pending.popleft():
+                    async with asyncio.timeout(SEND_TIMEOUT):
+                        if isinstance(frame, bytes):
+                            await self.websocket.send_bytes(frame)
+                        else:
+                            await self.websocket.send_text(frame)
+        except Exception:
+            self.close()
+        finally:
+            self.task = None
+            if not self.pending:
+                self.pending = None
+
+
+def register(
+    location_id: str,
+    user_id: int,
+    websocket: WebSocket,
+    encoding: str = "json",
+    batch: bool = False,
+) -> Connection:
+    connection = Connection(location_id, user_id, websocket, encoding, batch)
+    active_connections.setdefault(location_id, set()).add(connection)
+    return connection
+
+
+def unregister(connection: Connection):
+    location = active_connections.get(connection.location_id)
+    if location is None:
+        return
+
+    location.discard(connection)
+    if not location:
+        del active_connections[connection.location_id]
+
+
+def encode_json(data) -> str:
+    # The same encoding send_json() uses.
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_msgpack(data) -> bytes:
+    return msgpack.packb(data, default=str)
+
+
+class Stream:
+    """Numbered events of a location and a ring buffer of the latest ones."""
+
+    __slots__ = ("seq", "events")
+
+    def __init__(self):
+        self.seq = 0
+        self.events: Deque[dict] = deque(maxlen=REPLAY_SIZE)
+
+    def append(self, message: dict) -> dict:
+        self.seq += 1
+        event = {**message, "stream": STREAM_ID, "seq": self.seq}
+        self.events.append(event)
+        return event
+
+    def since(self, last_seq: int) -> Optional[List[dict]]:
+        """Events after `last_seq`, or None when some were already evicted."""
+        if last_seq > self.seq:
+            return None
+        first = self.events[0]["seq"] if self.events else self.seq + 1
+        if last_seq < first - 1:
+            return None
+        return [event for event in self.events if event["seq"] > last_seq]
+
+
+class Coalescer:
+    """Collects the events of a location for `COALESCE_WINDOW` and flushes
+    them as one frame per client.
+
+    Updates of the same booking slot on a table within the window collapse
+    into the last one. Each frame is encoded once per (encoding, batch)
+    variant, not once per socket. Flushed events are numbered and kept in
+    the location's `Stream`, whether anyone is connected or not.
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW):
+        self.window = window
+        self.pending: Dict[str, Dict[Tuple, dict]] = {}
+        self.streams: Dict[str, Stream] = {}
+
+    def stream(self, location_id: str) -> Stream:
+        stream = self.streams.get(location_id)
+        if stream is None:
+            stream = self.streams[location_id] = Stream()
+        return stream
+
+    def add(self, location_id: str, message: dict):
+        events = self.pending.get(location_id)
+        if events is None:
+            events = self.pending[location_id] = {}
+            asyncio.get_running_loop().call_later(self.window, self.flush, location_id)
+
+        key = self.key(message, len(events))
+        events.pop(key, None)
+        events[key] = message
+
+    @staticmethod
+    def key(message: dict, position: int) -> Tuple:
+        table_id = message.get("table_id")
+        if table_id is None:
+            return ("event", position)
+        return ("table", table_id, message.get("time_start"), message.get("time_end"))
+
+    def flush(self, location_id: str):
+        stream = self.stream(location_id)
+        events = [stream.append(message) for message in self.pending.pop(location_id, {}).values()]
+        self.send(location_id, events)
+
+    def send(self, location_id: str, events: List[dict], only: Connection = None):
+        connections = [only] if only else list(active_connections.get(location_id, ()))
+        if not events or not connections:
+            return
+
+        frames: Dict[Tuple[str, bool], List[Union[str, bytes]]] = {}
+        for connection in connections:
+            variant = (connection.encoding, connection.batch)
+            if variant not in frames:
+                frames[variant] = self.encode(events, *variant)
+            connection.push(frames[variant])
+
+    @staticmethod
+    def encode(events: List[dict], encoding: str, batch: bool) -> List[Union[str, bytes]]:
+        if encoding == "msgpack":
+            return [encode_msgpack(events)]
+        if batch:
+            return [encode_json(events)]
+        # Clients that did not ask for batches get one object per frame.
+        return [encode_json(event) for event in events]
+
+
+coalescer = Coalescer()
+
+
+async def get_snapshot(location_id: str, seq: int) -> dict:
+    from app.services.availability import availability_index
+
+    now = datetime.now(timezone.utc)
+    bookings = await availability_index.get_bookings(location_id, now)
+    return {
+        "event": "snapshot",
+        "stream": STREAM_ID,
+        "seq": seq,
+        # Formatted like `str(booking.time_start)` in the other events.
+        "bookings": [
+            {
+                "table_id": table_name,
+                "time_start": str(as_stored(time_start)),
+                "time_end": str(as_stored(time_end)),
+            }
+            for table_name, time_start, time_end in bookings
+        ],
+    }
+
+
+async def subscribe(
+    location_id: str,
+    user_id: int,
+    websocket: WebSocket,
+    encoding: str = "json",
+    batch: bool = False,
+    last_seq: Optional[int] = None,
+    stream_id: Optional[str] = None,
+) -> Connection:
+    """Registers a socket, first bringing a resuming client up to date.
+
+    A client that passes `last_seq` gets only the events it missed when they
+    are still in the ring buffer of this stream, and a snapshot otherwise.
+    """
+    if last_seq is None:
+        return register(location_id, user_id, websocket, encoding, batch)
+
+    stream = coalescer.stream(location_id)
+    missed = stream.since(last_seq) if stream_id == STREAM_ID else None
+
+    snapshot = None
+    if missed is None:
+        # Events flushed while the snapshot is read are replayed after it.
+        snapshot = await get_snapshot(location_id, stream.seq)
+        missed = stream.since(snapshot["seq"]) or []
+
+    connection = register(location_id, user_id, websocket, encoding, batch)
+    if snapshot is not None:
+        coalescer.send(location_id, [snapshot], only=connection)
+    coalescer.send(location_id, missed, only=connection)
+    return connection
+
+
+def broadcast(location_id: str, message: dict):
+    """Pushes an event to the sockets of this process."""
+    coalescer.add(location_id, message)
 
 
 async def notify_users(location_id: str, message: dict):
-    if active_connections.get(location_id):
-        for websocket in active_connections.get(location_id).values():
-            try:
-                await websocket.send_json(message)
-            except:
-                pass
+    """Publishes an event to the subscribers of a location on every worker."""
+    await event_bus.publish(location_id, message)
+
+
+event_bus.subscribe(broadcast)
@@ -0,0 +1,176 @@
+"""Admin booking list of a location with 50k bookings, on a scratch SQLite file.
+
+Compares the ORM path the endpoint used before (object graph through the
+admin list profile, one BookingAdminResponse per booking, then FastAPI's
+response_model validation and JSON encoding) with the projection query
+grouped into dicts and dumped by a TypeAdapter.
+
+    python tests/bench/bench_admin_bookings.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+DATABASE = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["ENGINE"] = f"sqlite+aiosqlite:///{DATABASE}"
+os.environ.setdefault("HOST", "http://localhost")
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+
+from app.infra.database.models import (
+    Admin,
+    Base,
+    Booking,
+    BookingUser,
+    BookingUserStatusEnum,
+    Location,
+    Table,
+    User,
+)
+from app.infra.database.session import engine
+from app.schemas.booking import BookingAdminResponse, UserBookingForAdmin
+from app.services.booking import BookingService
+
+TABLES = 500
+BOOKINGS_PER_TABLE = 100
+USERS = 2000
+# Every third booking has a second member.
+MEMBER_EVERY = 3
+
+START = datetime(2025, 3, 5, 8)
+
+
+async def seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Admin), [dict(id="a1", login="a", password="-")])
+        await conn.execute(
+            insert(Location), [dict(id="l1", name="L", address="A", admin_id="a1")]
+        )
+        await conn.execute(
+            insert(Table),
+            [
+                dict(id=f"t{t}", table_name=f"table{t}", location_id="l1", features=[])
+                for t in range(TABLES)
+            ],
+        )
+        await conn.execute(
+            insert(User), [dict(id=u, first_name=f"user{u}") for u in range(USERS)]
+        )
+
+        bookings, members = [], []
+        for t in range(TABLES):
+            for b in range(BOOKINGS_PER_TABLE):
+                booking_id = f"b{t}-{b}"
+                time_start = START + timedelta(hours=2 * b)
+                bookings.append(
+                    dict(
+                        id=booking_id,
+                        table_id=f"t{t}",
+                        time_start=time_start,
+                        time_end=time_start + timedelta(hours=1),
+                        features=[],
+                        code="0000",
+                        people_amount=2,
+                    )
+                )
+                n = t * BOOKINGS_PER_TABLE + b
+                members.append(
+                    dict(
+                        user_id=n % USERS,
+                        booking_id=booking_id,
+                        status=BookingUserStatusEnum.creator,
+                    )
+                )
+                if n % MEMBER_EVERY == 0:
+                    members.append(
+                        dict(
+                            user_id=(n + 1) % USERS,
+                            booking_id=booking_id,
+                            status=BookingUserStatusEnum.member,
+                        )
+                    )
+        await conn.execute(insert(Booking), bookings)
+        await conn.execute(insert(BookingUser), members)
+    return len(bookings), len(members)
+
+
+response_adapter = TypeAdapter(List[BookingAdminResponse])
+
+
+async def orm_graph(service: BookingService) -> bytes:
+    entries = await service.get_location_bookings("l1", "a1")
+    content = [
+        BookingAdminResponse(
+            id=entry.id,
+            location_id=entry.table.location_id,
+            code=entry.code,
+            table_id=entry.table.id,
+            table_name=entry.table.table_name,
+            time_start=entry.time_start,
+            time_end=entry.time_end,
+            comment=entry.comment,
+            features=entry.features,
+            people_amount=entry.people_amount,
+            users=[
+                UserBookingForAdmin(
+                    id=bookuser.id,
+                    first_name=bookuser.user.first_name,
+                    username=bookuser.user.username,
+                    user_id=bookuser.user.id,
+                    status=bookuser.status.value,
+                )
+                for bookuser in entry.users
+            ],
+        )
+        for entry in entries
+    ]
+    # What FastAPI does with a response_model: validate, dump, json.dumps.
+    validated = response_adapter.validate_python(content, from_attributes=True)
+    data = response_adapter.dump_python(validated, mode="json", exclude_none=True)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+async def projection(service: BookingService) -> bytes:
+    content, _ = await service.get_admin_bookings("l1", "a1")
+    return content
+
+
+async def main():
+    started = time.perf_counter()
+    bookings, members = await seed()
+    print(
+        f"{bookings} bookings, {members} members on {TABLES} tables "
+        f"(seeded in {time.perf_counter() - started:.1f}s)"
+    )
+
+    service = BookingService()
+    results = {}
+    for name, run in (("ORM graph + response_model", orm_graph), ("projection + TypeAdapter", projection)):
+        await run(service)
+        runs = 3
+        started = time.perf_counter()
+        for _ in range(runs):
+            body = await run(service)
+        elapsed = (time.perf_counter() - started) / runs
+        results[name] = body
+        print(f"{name:>28}: {elapsed * 1000:.0f} ms per request, {len(body) / 1e6:.1f} MB")
+
+    old, new = (json.loads(body) for body in results.values())
+    key = lambda booking: booking["id"]
+    print("same response:", sorted(old, key=key) == sorted(new, key=key))
+
+    await engine.dispose()
+    os.remove(DATABASE)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""Reminder burst through NotificationService against a local stand-in Bot API.
+
+The stand-in answers sendMessage like Telegram does and replies 429 with
+`retry_after` whenever the global or per-chat limit is broken. Limits are
+scaled up ×10 so the run takes seconds.
+
+    python tests/bench/bench_delivery.py
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from app.services.notification import NotificationService
+
+SCALE = 10
+GLOBAL_RATE = 30 * SCALE
+CHAT_RATE = 1 * SCALE
+
+CHATS = 200
+MESSAGES_PER_CHAT = 3
+TOKEN = "42:stand-in"
+
+
+class StandInBotAPI:
+    def __init__(self):
+        self.sent = deque()
+        self.last_by_chat = {}
+        self.accepted = 0
+        self.flood = 0
+
+    async def send_message(self, request: web.Request):
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        now = time.monotonic()
+
+        while self.sent and self.sent[0] <= now - 1:
+            self.sent.popleft()
+
+        # 5% slack for timer jitter on both sides.
+        too_fast = now - self.last_by_chat.get(chat_id, 0) < 0.95 / CHAT_RATE
+        if too_fast or len(self.sent) >= GLOBAL_RATE * 1.05:
+            self.flood += 1
+            return web.json_response(
+                dict(
+                    ok=False,
+                    error_code=429,
+                    description="Too Many Requests: retry after 1",
+                    parameters=dict(retry_after=1),
+                )
+            )
+
+        self.sent.append(now)
+        self.last_by_chat[chat_id] = now
+        self.accepted += 1
+        return web.json_response(
+            dict(
+                ok=True,
+                result=dict(
+                    message_id=self.accepted,
+                    date=int(time.time()),
+                    chat=dict(id=chat_id, type="private"),
+                    text=data["text"],
+                ),
+            )
+        )
+
+
+async def main():
+    api = StandInBotAPI()
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/sendMessage", api.send_message)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"))
+    bot = Bot(TOKEN, session=session)
+
+    service = NotificationService(
+        send=bot.send_message, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE
+    )
+    await service.start()
+
+    started = time.perf_counter()
+    for i in range(MESSAGES_PER_CHAT):
+        for chat_id in range(1, CHATS + 1):
+            service.send_message(chat_id=chat_id, text=f"reminder {i}")
+    await service.queue.join()
+    elapsed = time.perf_counter() - started
+
+    await service.stop()
+    await bot.session.close()
+    await runner.cleanup()
+
+    total = CHATS * MESSAGES_PER_CHAT
+    stats = service.stats()
+    print(f"{total} messages to {CHATS} chats in {elapsed:.2f}s "
+          f"(ideal {total / GLOBAL_RATE:.2f}s at {GLOBAL_RATE}/s)")
+    print(f"accepted {api.accepted}, answered 429 {api.flood}")
+    print(
+        f"latency avg {stats['latency_avg']:.2f}s, p95 {stats['latency_p95']:.2f}s, "
+        f"max {stats['latency_max']:.2f}s; failed {stats['failed']}, retried {stats['retried']}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
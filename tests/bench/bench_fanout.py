@@ -0,0 +1,110 @@
+"""Broadcast fan-out to 5k sockets on one location.
+
+Sockets are in-process stand-ins; 1% of them take 100 ms per frame, like
+phones on bad Wi-Fi. Measures how long it takes every healthy socket to
+get an event, for the old sequential `send_json` loop and for the
+per-connection queues.
+
+    python tests/bench/bench_fanout.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+os.environ.setdefault("HOST", "http://localhost")
+
+from app.config import active_connections
+from app.utils.websockets import notify_users, register
+
+SOCKETS = 5000
+SLOW_EVERY = 100
+SLOW_DELAY = 0.1
+EVENTS = 3
+LOCATION = "bench"
+
+MESSAGES = [
+    {
+        "event": "booking_created",
+        "table_id": f"table{i}",
+        "time_start": "2025-03-05 10:00:00+00:00",
+        "time_end": "2025-03-05 12:00:00+00:00",
+    }
+    for i in range(EVENTS)
+]
+
+
+class StandInSocket:
+    def __init__(self, slow: bool):
+        self.slow = slow
+        self.received = 0
+        self.done = None
+
+    async def send_text(self, frame: str):
+        await asyncio.sleep(SLOW_DELAY if self.slow else 0)
+        self.received += 1
+        if not self.slow and self.received == EVENTS:
+            self.done.set_result(time.perf_counter())
+
+    async def send_json(self, data: dict):
+        import json
+
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def make_sockets():
+    loop = asyncio.get_running_loop()
+    sockets = [StandInSocket(i % SLOW_EVERY == 0) for i in range(SOCKETS)]
+    for socket in sockets:
+        socket.done = loop.create_future()
+    return sockets
+
+
+async def sequential():
+    sockets = make_sockets()
+    started = time.perf_counter()
+    for message in MESSAGES:
+        for socket in sockets:
+            try:
+                await socket.send_json(message)
+            except Exception:
+                pass
+    return await finish(sockets, started)
+
+
+async def queued():
+    sockets = make_sockets()
+    connections = [register(LOCATION, i, socket) for i, socket in enumerate(sockets)]
+
+    started = time.perf_counter()
+    for message in MESSAGES:
+        await notify_users(LOCATION, message)
+    result = await finish(sockets, started)
+
+    for connection in connections:
+        connection.close()
+    active_connections.pop(LOCATION, None)
+    return result
+
+
+async def finish(sockets, started):
+    healthy = [socket.done for socket in sockets if not socket.slow]
+    finished = await asyncio.gather(*healthy)
+    return max(finished) - started, sorted(finished)[len(finished) // 2] - started
+
+
+async def main():
+    for name, run in (("sequential send_json", sequential), ("queued", queued)):
+        last, median = await run()
+        print(
+            f"{name:>22}: {EVENTS} events to {SOCKETS} sockets, "
+            f"healthy sockets done in median {median * 1000:.0f} ms, last {last * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""CPU and memory of 20k idle WebSocket connections on one location.
+
+Compares the old endpoint loop, `while True: await asyncio.sleep(1)` with a
+`{user_id: websocket}` map, to the receive-driven handler that is parked on
+`websocket.receive()` until the peer goes away. Sockets are in-process
+stand-ins.
+
+    python tests/bench/bench_idle_connections.py
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+os.environ.setdefault("HOST", "http://localhost")
+
+from app.config import active_connections
+from app.utils.websockets import subscribe
+
+CONNECTIONS = 20_000
+IDLE_SECONDS = 5
+LOCATION = "bench"
+
+
+class StandInSocket:
+    def __init__(self):
+        self.disconnected = asyncio.get_running_loop().create_future()
+
+    async def receive(self):
+        return await self.disconnected
+
+    async def send_text(self, frame: str): ...
+
+    async def close(self, code: int = 1000): ...
+
+
+async def sleeping_handler(user_id: int, registry: dict):
+    websocket = StandInSocket()
+    registry.setdefault(LOCATION, {})[user_id] = websocket
+    while True:
+        await asyncio.sleep(1)
+
+
+async def receiving_handler(user_id: int, sockets: list):
+    websocket = StandInSocket()
+    sockets.append(websocket)
+    connection = await subscribe(LOCATION, user_id, websocket)
+    try:
+        while connection.alive:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        connection.close(code=None)
+
+
+async def measure(name, start_handlers):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    tasks = start_handlers()
+    await asyncio.sleep(1)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    cpu = time.process_time()
+    await asyncio.sleep(IDLE_SECONDS)
+    cpu = time.process_time() - cpu
+
+    print(
+        f"{name:>16}: {CONNECTIONS} idle connections, "
+        f"{memory / CONNECTIONS:.0f} B each, "
+        f"CPU {cpu / IDLE_SECONDS * 100:.1f}% of a core"
+    )
+    return tasks
+
+
+async def main():
+    registry = {}
+    tasks = await measure(
+        "sleep(1) loop",
+        lambda: [
+            asyncio.create_task(sleeping_handler(i, registry))
+            for i in range(CONNECTIONS)
+        ],
+    )
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    sockets = []
+    tasks = await measure(
+        "receive-driven",
+        lambda: [
+            asyncio.create_task(receiving_handler(i, sockets))
+            for i in range(CONNECTIONS)
+        ],
+    )
+    for websocket in sockets:
+        websocket.disconnected.set_result({"type": "websocket.disconnect"})
+    await asyncio.gather(*tasks)
+    print(f"locations left in the registry: {len(active_connections)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""Occupancy matrix build at 1k tables × 48 hourly slots.
+
+    python tests/bench/bench_occupancy.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from random import Random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from app.utils.occupancy import OccupancyMatrix
+
+TABLES = 1000
+SLOTS = 48
+BOOKINGS_PER_TABLE = 6
+
+START = datetime(2025, 3, 5)
+
+
+def make_rows():
+    rnd = Random(44)
+    rows = []
+    for t in range(TABLES):
+        hour = 0
+        for _ in range(BOOKINGS_PER_TABLE):
+            hour += rnd.randint(0, 3)
+            length = rnd.randint(1, 4)
+            if hour + length > SLOTS:
+                break
+            rows.append(
+                (
+                    f"t{t}",
+                    f"table{t}",
+                    1,
+                    START + timedelta(hours=hour),
+                    START + timedelta(hours=hour + length),
+                )
+            )
+            hour += length
+    return rows
+
+
+def build_lists(rows):
+    # The previous approach: one Python list per table, filled hour by hour.
+    timelines = {}
+    for table_id, _, _, time_start, time_end in rows:
+        timeline = timelines.setdefault(table_id, [0] * SLOTS)
+        day = (time_start.date() - START.date()).days
+        for j in range(time_start.hour, time_end.hour if time_end.hour else 24):
+            timeline[24 * day + j] = 1
+    return timelines
+
+
+def build_matrix(rows):
+    return OccupancyMatrix.from_rows(START, SLOTS, rows)
+
+
+if __name__ == "__main__":
+    rows = make_rows()
+    print(f"{TABLES} tables × {SLOTS} slots, {len(rows)} bookings")
+
+    for name, fn in [("lists", build_lists), ("bit-packed", build_matrix)]:
+        runs = 20
+        seconds = timeit.timeit(lambda: fn(rows), number=runs) / runs
+        print(f"{name:>10}: {seconds * 1000:.2f} ms per build")
+
+    matrix = build_matrix(rows)
+    first, last = matrix.slot_range(START + timedelta(hours=9), START + timedelta(hours=12))
+    runs = 200
+    seconds = timeit.timeit(
+        lambda: [r for r in range(TABLES) if matrix.is_free(r, first, last)], number=runs
+    ) / runs
+    print(f"free-range scan: {seconds * 1e6:.0f} µs over {TABLES} tables")
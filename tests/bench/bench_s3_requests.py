@@ -0,0 +1,114 @@
+"""HTTP requests and time per Storage call, with a client per call as before
+and with the shared client.
+
+Runs against moto's S3 server (`pip install "moto[server]"`), or against
+MinIO when MINIO_URL is set, e.g. the one of tests/e2e/docker-compose.yaml:
+
+    python tests/bench/bench_s3_requests.py
+    MINIO_URL=http://localhost:9000 MINIO_ROOT_USER=minio \\
+        MINIO_ROOT_PASSWORD=minio123 python tests/bench/bench_s3_requests.py
+"""
+import asyncio
+import logging
+import os
+import socket
+import sys
+import time
+from uuid import uuid4
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+server = None
+if not os.environ.get("MINIO_URL"):
+    from moto.server import ThreadedMotoServer
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=port, verbose=False)
+    server.start()
+    os.environ.update(
+        MINIO_URL=f"http://127.0.0.1:{port}",
+        MINIO_ROOT_USER="stand-in",
+        MINIO_ROOT_PASSWORD="stand-in",
+        AWS_DEFAULT_REGION="us-east-1",
+    )
+
+from app.infra.s3.client import s3
+from app.infra.s3.storage import Storage
+
+CALLS = 50
+SVG = b"<svg>" + b"x" * 50_000 + b"</svg>"
+
+
+class RequestCounter:
+    def __init__(self):
+        self.count = 0
+        self.hooked = None
+
+    def __call__(self, **_):
+        self.count += 1
+
+    async def start(self):
+        # Hooks whichever client s3 holds now, the old mode makes a new one
+        # before every call.
+        client = await s3.start()
+        if client is not self.hooked:
+            client.meta.events.register("before-send.s3", self)
+            self.hooked = client
+
+
+async def run(storage: Storage, counter: RequestCounter, shared: bool):
+    key = f"{uuid4()}.svg"
+    calls = (
+        ("upload_file", lambda: storage.upload_file(SVG, key)),
+        ("exists", lambda: storage.exists(key)),
+        ("read_file", lambda: storage.read_file(key)),
+        ("generate_url", lambda: storage.generate_url(key)),
+        ("delete_file", lambda: storage.delete_file(key)),
+    )
+    results = {}
+    for name, call in calls:
+        requests, elapsed = 0, 0.0
+        for _ in range(CALLS):
+            if not shared:
+                await s3.stop()
+            await counter.start()
+            before = counter.count
+            started = time.perf_counter()
+            await call()
+            elapsed += time.perf_counter() - started
+            requests += counter.count - before
+        results[name] = (requests / CALLS, elapsed / CALLS)
+    return results
+
+
+async def main():
+    storage = Storage(f"bench-{uuid4().hex[:8]}")
+    counter = RequestCounter()
+
+    # Prints of Storage are noise here.
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        per_call = await run(storage, counter, shared=False)
+        await s3.stop()
+        shared = await run(storage, counter, shared=True)
+    finally:
+        sys.stdout = stdout
+
+    print(f"{'':>14}{'client per call':>26}{'shared client':>26}")
+    for name in per_call:
+        (old_requests, old_time), (new_requests, new_time) = per_call[name], shared[name]
+        print(
+            f"{name:>14}{old_requests:>10.1f} req {old_time * 1000:>8.1f} ms"
+            f"{new_requests:>10.1f} req {new_time * 1000:>8.1f} ms"
+        )
+
+    await s3.stop()
+    if server is not None:
+        server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
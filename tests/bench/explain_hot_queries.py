@@ -0,0 +1,72 @@
+"""Print the query plan of every hot query on the configured ENGINE.
+
+    ENGINE=postgresql+asyncpg://... python tests/bench/explain_hot_queries.py
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from sqlalchemy import select, text
+
+from app.config import ENGINE
+from app.infra.database.models import Admin, Booking, BookingUser, QueueUser, Table, User
+from app.infra.database.session import engine
+
+NOW = datetime(2025, 3, 5, 12)
+DAY = datetime(2025, 3, 5)
+
+QUERIES = {
+    "overlap on a table": select(Booking.id).where(
+        Booking.table_id == "t",
+        Booking.time_start < NOW + timedelta(hours=2),
+        Booking.time_end > NOW,
+    ),
+    "user bookings": select(BookingUser.booking_id).where(BookingUser.user_id == 1),
+    "booking members": select(BookingUser.user_id).where(BookingUser.booking_id == "b"),
+    "location queue for a day": select(QueueUser.id).where(
+        QueueUser.location_id == "l",
+        QueueUser.date >= DAY,
+        QueueUser.date < DAY + timedelta(days=1),
+    ),
+    "user by phone": select(User.id).where(User.phone == "+70000000000"),
+    "admin by login": select(Admin.id).where(Admin.login == "admin"),
+    "table by name": select(Table.id).where(
+        Table.location_id == "l", Table.table_name == "table1"
+    ),
+    "bookings starting soon": select(Booking.id).where(
+        Booking.notification_for_fronted_about_start == False,
+        Booking.time_start <= NOW,
+    ),
+    "bookings ending soon": select(Booking.id).where(
+        Booking.notification_for_fronted_about_canceled == False,
+        Booking.time_end <= NOW,
+    ),
+    "start reminders due": select(Booking.id).where(
+        Booking.notification_sent_start == False,
+        Booking.time_start <= NOW,
+    ),
+    "end reminders due": select(Booking.id).where(
+        Booking.notification_sent == False,
+        Booking.time_end <= NOW,
+        Booking.time_end > NOW - timedelta(hours=3),
+    ),
+}
+
+
+async def main():
+    explain = "EXPLAIN" if "postgresql" in ENGINE else "EXPLAIN QUERY PLAN"
+
+    async with engine.connect() as conn:
+        for name, query in QUERIES.items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            rows = await conn.execute(text(f"{explain} {sql}"))
+            print(f"-- {name}")
+            for row in rows:
+                print("  ", row[-1])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
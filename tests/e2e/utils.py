@@ -0,0 +1,39 @@
+import json
+
+
+def _ids(ids: str):
+    return ids.split(",") if ids else []
+
+
+def save_booking_ids(response, count):
+    """Saves the ids of a booking list, comma-separated, as `all_booking_ids`."""
+    ids = [booking["id"] for booking in response.json()]
+    assert len(ids) == int(count), f"в списке {len(ids)} броней вместо {count}"
+    assert len(ids) == len(set(ids)), "повторяющиеся брони в списке"
+    return {"all_booking_ids": ",".join(ids)}
+
+
+def save_page_ids(response, seen=""):
+    """Appends the ids of a page to the ones of the pages before it and saves
+    them as `paged_ids`. A booking may not show up on two pages."""
+    ids = _ids(seen)
+    for booking in response.json():
+        assert booking["id"] not in ids, f"бронь {booking['id']} уже была на прошлой странице"
+        ids.append(booking["id"])
+    return {"paged_ids": ",".join(ids)}
+
+
+def check_last_page(response, seen, expected):
+    """The pages together are the whole list in order, and the last one
+    has no next page."""
+    assert "X-Next-Cursor" not in response.headers, "у последней страницы есть курсор"
+    ids = _ids(seen) + [booking["id"] for booking in response.json()]
+    assert ids == _ids(expected), f"страницы {ids} не совпадают со списком {expected}"
+
+
+def check_booking_stream(response, expected):
+    """One booking per line, in list order, each with its members."""
+    bookings = [json.loads(line) for line in response.text.splitlines()]
+    assert [booking["id"] for booking in bookings] == _ids(expected)
+    for booking in bookings:
+        assert booking["users"], f"у брони {booking['id']} нет участников"